@@ -0,0 +1,230 @@
+"""Benchmark und Korrektheitsprüfung der Handicap-Berechnungen über das komplette HCPI-Raster.
+
+Aufruf:  python benchmark_handicaps.py [course_data.json] [--repeat 7]
+                                       [--baseline benchmark_baseline.json] [--save-baseline benchmark_baseline.json]
+
+Für jeden Abschlag in course_data.json wird jeder HCPI von HCPI_MIN bis HCPI_MAX in 0.1-Schritten
+gerechnet: urs_round, CH18 (handicapRanges oder Formel), CH9 (Formel), die Matchplay-Vorgabe
+|CH1 - CH2| * 2/3, der Team-HCPI 60/40 und die Vierer-Vorgabe.
+
+Korrektheit: Alle Werte werden gegen die Referenz aus build_course_snapshot.py (lineare Suche in den
+rohen handicapRanges bzw. direkte Formel) und gegen exakte Bruchrechnung geprüft. Abweichungen
+zwischen handicapRanges und Formel werden je Abschlag gemeldet (kein Fehler, die Tabelle ist maßgeblich).
+
+Performance: je Fall Aufrufe/s und Latenz pro Aufruf (bester Lauf und Median aus --repeat Läufen).
+Mit --baseline wird gegen eine gespeicherte Messung verglichen; die Zeiten werden dabei auf eine
+Kalibrierschleife normiert, damit kleinere Unterschiede zwischen Rechnern nicht als Regression zählen.
+
+Auf geteilten oder lastabhängigen Rechnern streuen die Messungen stärker; dann --tolerance erhöhen.
+
+Exit-Code: 0 ok, 1 Rechenfehler, 2 Performance-Regression.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from fractions import Fraction
+
+from build_course_snapshot import range_formula_disagreements, reference_course_handicap
+from handicap_engine import (
+    HCPI_MAX, HCPI_MIN, HCPI_STEP, course_handicap_18, course_handicap_9, course_handicaps_18_many,
+    course_handicaps_9_many, foursome_allowance,
+    load_course_index, matchplay_allowance, table_course_handicap, team_hcpi, urs_round,
+)
+
+# HCPI-Raster der Eingabe, in Zehnteln gebildet wie eine Eingabe im Zahlenfeld
+GRID_TENTHS = range(round(HCPI_MIN / HCPI_STEP), round(HCPI_MAX / HCPI_STEP) + 1)
+GRID = tuple(t / 10 for t in GRID_TENTHS)
+TEAM_PARTNER_STRIDE = 10  # Team-Paarungen für die Zeitmessung: jeder HCPI mit jedem zehnten Partner-HCPI
+DEFAULT_TOLERANCE = 0.25  # erlaubte Verlangsamung gegenüber der Baseline (normiert)
+MIN_SAMPLE_SECONDS = 0.05  # Mindestdauer eines Messlaufs, kürzere Läufe sind zu stark verrauscht
+
+
+def _exact_formula(raw_tee, hole_count, hcpi_tenths):
+    """URS-Formel mit exakten Brüchen aus den Dezimalwerten der Rohdaten (ohne float-Rundungsfehler; round() auf
+    Fraction rundet exakt half-to-even wie urs_round)."""
+    hcpi = Fraction(hcpi_tenths, 10 if hole_count == 18 else 20)
+    return round(hcpi * Fraction(str(raw_tee["SR"])) / 113 + Fraction(str(raw_tee["CR"])) - Fraction(str(raw_tee["Par"])))
+
+
+def _tees(course_data, index):
+    """[(Bezeichnung, CourseInfo, TeeData, Rohdaten des Abschlags)] für alle Abschläge."""
+    raw_tees = {(c["category"], c["holes"], color): t for c in course_data.get("courseHandicaps", ()) for color, t in c["tees"].items()}
+    return [(f"{course.category} / {course.holes} / {color}", course, tee, raw_tees[(course.category, course.holes, color)])
+            for course in index.courses for color, tee in course.tees.items()]
+
+
+# --- Korrektheit ---
+
+def check_correctness(tees):
+    """Liefert (Fehler, Hinweise) als Textzeilen."""
+    errors, notes = [], []
+    for label, course, tee, raw_tee in tees:
+        many_18 = list(course_handicaps_18_many(tee, GRID))
+        many_9 = list(course_handicaps_9_many(tee, GRID))
+        rounding = 0
+        for i, (tenths, h) in enumerate(zip(GRID_TENTHS, GRID)):
+            expected = {kind: reference_course_handicap(raw_tee, kind, h) for kind in ("18", "9", "table")}
+            actual = {"18": course_handicap_18(tee, h), "9": course_handicap_9(tee, h), "table": table_course_handicap(tee, h)}
+            for kind, value in actual.items():
+                if value != expected[kind]:
+                    errors.append(f"{label}: CH{kind} bei HCPI {h:.1f} -> {value}, erwartet {expected[kind]}")
+            if many_18[i] != expected["18"] or many_9[i] != expected["9"]:
+                errors.append(f"{label}: vektorisierte CH bei HCPI {h:.1f} -> {many_18[i]}/{many_9[i]}, "
+                              f"erwartet {expected['18']}/{expected['9']}")
+            formula_kind = "18" if course.hole_count == 18 else "9"
+            formula = reference_course_handicap({k: v for k, v in raw_tee.items() if k != "handicapRanges"}, formula_kind, h)
+            if formula != _exact_formula(raw_tee, course.hole_count, tenths):
+                rounding += 1
+        if rounding:
+            notes.append(f"{label}: {rounding} HCPI-Werte, bei denen urs_round auf float anders rundet als exakt")
+
+        differing = range_formula_disagreements(raw_tee, course.hole_count, GRID)
+        if differing:
+            h, table, formula = differing[0]
+            max_diff = max(abs(t - f) for _, t, f in differing)
+            notes.append(f"{label}: handicapRanges weicht bei {len(differing)} von {len(GRID)} HCPI-Werten von der Formel ab "
+                         f"(max. {max_diff} Schläge, z.B. HCPI {h:.1f} Tabelle {table}, Formel {formula})")
+        covered = sum(reference_course_handicap(raw_tee, "table", h) is not None for h in GRID)
+        if raw_tee.get("handicapRanges") and covered < len(GRID):
+            notes.append(f"{label}: handicapRanges deckt {len(GRID) - covered} HCPI-Werte nicht ab (dort gilt die Formel)")
+
+    # Matchplay-Vorgabe und Vierer-Vorgabe für alle CH-Differenzen, die auf dem Raster vorkommen können
+    for ch1 in range(-10, 71):
+        for ch2 in range(-10, 71):
+            receiver = 0 if ch1 == ch2 else (1 if ch1 > ch2 else 2)
+            single, foursome = matchplay_allowance(ch1, ch2), foursome_allowance(ch1, ch2)
+            if single.strokes != round(Fraction(abs(ch1 - ch2) * 2, 3)) or single.receiver != receiver:
+                errors.append(f"matchplay_allowance({ch1}, {ch2}) -> {single.strokes}/{single.receiver}")
+            if foursome.strokes != abs(ch1 - ch2) or foursome.receiver != receiver:
+                errors.append(f"foursome_allowance({ch1}, {ch2}) -> {foursome.strokes}/{foursome.receiver}")
+
+    # Team-HCPI: exakt (6 * min + 4 * max) Hundertstel, ohne float-Rest
+    for ta in GRID_TENTHS:
+        for tb in GRID_TENTHS:
+            if tb < ta: continue
+            value = team_hcpi(ta / 10, tb / 10)
+            if value != (6 * ta + 4 * tb) / 100:
+                errors.append(f"team_hcpi({ta / 10:.1f}, {tb / 10:.1f}) -> {value!r}, erwartet {(6 * ta + 4 * tb) / 100:.2f}")
+    return errors, notes
+
+
+# --- Performance ---
+
+def benchmark_cases(tees):
+    """{Name: (Funktion, Anzahl Aufrufe)}; jede Funktion rechnet das komplette Raster für alle Abschläge."""
+    raw_values = [h * (tee.SR / 113) + (tee.CR - tee.Par) for _, _, tee, _ in tees for h in GRID]
+    pairs = [(a, GRID[j]) for a in GRID for j in range(0, len(GRID), TEAM_PARTNER_STRIDE)]
+    chs = [course_handicap_18(tee, h) for _, course, tee, _ in tees if course.hole_count == 18 for h in GRID]
+    ch_pairs = list(zip(chs, chs[len(chs) // 3:] + chs[:len(chs) // 3]))
+    n = len(tees) * len(GRID)
+    return {
+        "urs_round": (lambda: [urs_round(x) for x in raw_values], len(raw_values)),
+        "course_handicap_18": (lambda: [course_handicap_18(tee, h) for _, _, tee, _ in tees for h in GRID], n),
+        "course_handicap_9": (lambda: [course_handicap_9(tee, h) for _, _, tee, _ in tees for h in GRID], n),
+        "course_handicaps_18_many": (lambda: [course_handicaps_18_many(tee, GRID) for _, _, tee, _ in tees], n),
+        "course_handicaps_9_many": (lambda: [course_handicaps_9_many(tee, GRID) for _, _, tee, _ in tees], n),
+        "matchplay_allowance": (lambda: [matchplay_allowance(a, b) for a, b in ch_pairs], len(ch_pairs)),
+        "team_hcpi": (lambda: [team_hcpi(a, b) for a, b in pairs], len(pairs)),
+        "foursome_allowance": (lambda: [foursome_allowance(a, b) for a, b in ch_pairs], len(ch_pairs)),
+    }
+
+
+def _time_per_call(func, calls, repeat):
+    """(bester, Median) in ns pro Aufruf; jeder Messlauf wiederholt func, bis er MIN_SAMPLE_SECONDS dauert."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops): func()
+        if time.perf_counter() - start >= MIN_SAMPLE_SECONDS: break
+        loops *= 2
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops): func()
+        samples.append((time.perf_counter() - start) / (loops * calls) * 1e9)
+    return min(samples), statistics.median(samples)
+
+
+def calibration_ns(repeat):
+    """Zeit pro Iteration einer einfachen Python-Schleife; Bezugsgröße für den Vergleich mit der Baseline."""
+    values = [float(i) for i in range(10_000)]
+    return _time_per_call(lambda: [x * 0.5 + 1.0 for x in values], len(values), repeat)[0]
+
+
+def run_benchmarks(tees, repeat):
+    """Misst alle Fälle; direkt vor jedem Fall läuft die Kalibrierung, damit Taktschwankungen beide gleich treffen."""
+    results = {}
+    for name, (func, calls) in benchmark_cases(tees).items():
+        func()  # Aufwärmen (Lazy-Import von numpy)
+        calibration = calibration_ns(repeat)
+        best, median = _time_per_call(func, calls, repeat)
+        results[name] = {"calls": calls, "ns_per_call": best, "median_ns_per_call": median, "calibration_ns": calibration}
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    """[(Name, Faktor)] für alle Fälle, die normiert um mehr als tolerance langsamer sind als die Baseline."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        factor = (result["ns_per_call"] / result["calibration_ns"]) / (before["ns_per_call"] / before["calibration_ns"])
+        if factor > 1 + tolerance:
+            regressions.append((name, factor))
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark und Korrektheitsprüfung der Handicap-Berechnungen")
+    parser.add_argument("course_data", nargs="?", default="course_data.json")
+    parser.add_argument("--repeat", type=int, default=7, help="Messläufe je Fall (bester Lauf zählt)")
+    parser.add_argument("--baseline", help="gespeicherte Messung, gegen die auf Regressionen geprüft wird")
+    parser.add_argument("--save-baseline", help="aktuelle Messung als Baseline speichern")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="erlaubte Verlangsamung, z.B. 0.25 = 25 %%")
+    args = parser.parse_args(argv[1:])
+
+    with open(args.course_data, encoding="utf-8") as f:
+        course_data = json.load(f)  # Rohdaten für die Referenz
+    index = load_course_index(args.course_data, use_snapshot=False)
+    tees = _tees(course_data, index)
+    print(f"{args.course_data}: {len(tees)} Abschläge, {len(GRID)} HCPI-Werte von {HCPI_MIN} bis {HCPI_MAX}")
+
+    errors, notes = check_correctness(tees)
+    for line in notes:
+        print(f"Hinweis: {line}")
+    for line in errors[:50]:
+        print(f"FEHLER: {line}", file=sys.stderr)
+    if errors:
+        print(f"{len(errors)} Abweichungen von der Referenz.", file=sys.stderr)
+        return 1
+    print("Korrektheit: alle Werte stimmen mit der Referenz überein.")
+
+    results = run_benchmarks(tees, args.repeat)
+    print(f"\n{'Fall':<28} {'Aufrufe':>9} {'ns/Aufruf':>10} {'Median':>10} {'Aufrufe/s':>13} {'normiert':>9}")
+    for name, result in results.items():
+        print(f"{name:<28} {result['calls']:>9} {result['ns_per_call']:>10.1f} {result['median_ns_per_call']:>10.1f} "
+              f"{1e9 / result['ns_per_call']:>13,.0f} {result['ns_per_call'] / result['calibration_ns']:>9.2f}")
+    print("normiert = ns/Aufruf geteilt durch ns/Iteration der Kalibrierschleife")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline gespeichert: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for name, factor in regressions:
+            print(f"REGRESSION: {name} ist {factor:.2f}x so langsam wie in {args.baseline}", file=sys.stderr)
+        if regressions:
+            return 2
+        print(f"Keine Regression gegenüber {args.baseline} (Toleranz {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,136 @@
+"""Build-Schritt: prüft die CH-Berechnung gegen eine unabhängige Referenz und schreibt den
+kompilierten Snapshot course_data.compiled.bin neben course_data.json.
+
+Aufruf:  python build_course_snapshot.py [course_data.json]
+
+Für jeden Abschlag werden CH18 (Tabelle oder Formel), CH9 (Formel) und der Tabellenwert für
+das 0.1-Raster der Eingabe von HCPI_MIN bis HCPI_MAX und alle Team-HCPIs geprüft, die
+team_hcpi() daraus bilden kann. Referenz ist eine lineare Suche in den rohen handicapRanges
+bzw. die direkte URS-Formel; der NumPy-Pfad des Turnier-Batch (course_handicaps_*_many,
+team_hcpis_many) muss dieselben Werte liefern. Abweichungen zwischen handicapRanges und Formel
+werden nur gemeldet, da die Tabelle des Clubs maßgeblich ist.
+
+Vorberechnete CH-Tabellen werden nicht geschrieben: ein Tabellen-Lookup war nicht schneller
+als bisect plus Formel. Zum Schluss wird über load_course_index() der Snapshot erzeugt, den die
+stlite-App statt der JSON laden kann.
+"""
+import hashlib
+import json
+import os
+import sys
+
+from handicap_engine import (
+    COMPUTE_BY_KIND, HCPI_MAX, HCPI_MIN, HCPI_STEP, CourseDataError, build_course_index, course_handicaps_18_many,
+    course_handicaps_9_many, load_course_index, snapshot_path_for, team_hcpi, team_hcpis_many, validate_course_data,
+)
+
+# HCPI-Raster der Eingabe in Zehnteln
+INPUT_TENTHS = range(round(HCPI_MIN / HCPI_STEP), round(HCPI_MAX / HCPI_STEP) + 1)
+
+
+def reference_course_handicap(raw_tee, kind, hcpi):
+    """Referenzwert direkt aus den Rohdaten, ohne Engine-Code (auch von benchmark_handicaps.py genutzt)."""
+    table = next((r["CourseHCP"] for r in raw_tee.get("handicapRanges", ()) if r["HCPI_min"] <= hcpi <= r["HCPI_max"]), None)
+    if kind == "table":
+        return table
+    if kind == "9":
+        return round((hcpi / 2.0) * (raw_tee["SR"] / 113) + (raw_tee["CR"] - raw_tee["Par"]))
+    return table if table is not None else round(hcpi * (raw_tee["SR"] / 113) + (raw_tee["CR"] - raw_tee["Par"]))
+
+
+def range_formula_disagreements(raw_tee, hole_count, hcpis):
+    """[(HCPI, Tabellenwert, Formelwert)] für alle hcpis, bei denen handicapRanges und URS-Formel abweichen."""
+    formula_kind = "18" if hole_count == 18 else "9"
+    formula_only = {k: v for k, v in raw_tee.items() if k != "handicapRanges"}
+    return [(h, table, formula) for h in hcpis
+            if (table := reference_course_handicap(raw_tee, "table", h)) is not None
+            and table != (formula := reference_course_handicap(formula_only, formula_kind, h))]
+
+
+def team_hcpi_values():
+    """(alle Team-HCPIs aus zwei Eingabe-HCPIs, sortiert; Fehler): team_hcpi() muss exakt (6 * min + 4 * max) Hundertstel liefern."""
+    values, errors = set(), []
+    tenths = list(INPUT_TENTHS)
+    for n, ta in enumerate(tenths):
+        partners = tenths[n:]
+        many = team_hcpis_many([ta / 10] * len(partners), [tb / 10 for tb in partners])
+        for tb, value_many in zip(partners, many):
+            expected = (6 * ta + 4 * tb) / 100
+            value = team_hcpi(ta / 10, tb / 10)
+            if value != expected or value_many != expected:
+                errors.append(f"team_hcpi({ta / 10:.1f}, {tb / 10:.1f}) -> {value!r} / NumPy {value_many!r}, erwartet {expected:.2f}")
+            values.add(value)
+    return sorted(values), errors
+
+
+def check_tee(label, tee, raw_tee, hcpis):
+    """Fehlerzeilen für einen Abschlag: Engine (einzeln und vektorisiert) gegen die Referenz für alle hcpis."""
+    errors = []
+    many = {"18": course_handicaps_18_many(tee, hcpis), "9": course_handicaps_9_many(tee, hcpis)}
+    for kind, compute in COMPUTE_BY_KIND.items():
+        for i, h in enumerate(hcpis):
+            value, expected = compute(tee, h), reference_course_handicap(raw_tee, kind, h)
+            if value != expected:
+                errors.append(f"{label} / {kind}: HCPI {h:.2f} -> {value}, erwartet {expected}")
+            elif kind in many and many[kind][i] != value:
+                errors.append(f"{label} / {kind}: HCPI {h:.2f} vektorisiert {many[kind][i]}, einzeln {value}")
+    return errors
+
+
+def check_course_data(course_data_path):
+    with open(course_data_path, "rb") as f:
+        raw = f.read()
+    course_data = json.loads(raw.decode("utf-8"))
+    warnings = validate_course_data(course_data)
+    index = build_course_index(course_data, version=hashlib.sha1(raw).hexdigest())
+
+    raw_tees = {(c["category"], c["holes"], color): t for c in course_data.get("courseHandicaps", ()) for color, t in c["tees"].items()}
+    input_hcpis = [t / 10 for t in INPUT_TENTHS]
+    team_hcpis, errors = team_hcpi_values()
+    hcpis = sorted(set(input_hcpis) | set(team_hcpis))
+    disagreements, checked = [], 0
+    for course in index.courses:
+        for color, tee in course.tees.items():
+            raw_tee = raw_tees[(course.category, course.holes, color)]
+            errors += check_tee(f"{course.category} / {course.holes} / {color}", tee, raw_tee, hcpis)
+            checked += 1
+
+            # Tabelle vs. Formel nur auf dem 0.1-Raster der Eingabe vergleichen, je Abschlag zusammengefasst
+            differing = range_formula_disagreements(raw_tee, course.hole_count, input_hcpis)
+            if differing:
+                h, table, formula = differing[0]
+                disagreements.append(f"{course.category} / {course.holes} / {color}: {len(differing)} HCPI-Werte, "
+                                     f"z.B. HCPI {h:.1f} Tabelle {table}, Formel {formula}")
+
+    return checked, len(hcpis), errors, warnings + [f"handicapRanges weicht von der Formel ab: {line}" for line in disagreements]
+
+
+def main(argv):
+    course_data_path = argv[1] if len(argv) > 1 else "course_data.json"
+    try:
+        checked, hcpi_count, errors, notes = check_course_data(course_data_path)
+    except CourseDataError as e:
+        for line in e.errors:
+            print(f"FEHLER: {line}", file=sys.stderr)
+        return 1
+
+    for line in notes:
+        print(f"Hinweis: {line}")
+    if errors:
+        for line in errors[:50]:
+            print(f"FEHLER: {line}", file=sys.stderr)
+        print(f"{len(errors)} Abweichungen von der Referenz, Snapshot wurde nicht geschrieben.", file=sys.stderr)
+        return 1
+    print(f"{checked} Abschläge mit je {hcpi_count} HCPI-Werten (Eingaben und Team-HCPIs) geprüft ({len(notes)} Hinweise).")
+
+    snapshot_path = snapshot_path_for(course_data_path)
+    load_course_index(course_data_path)  # schreibt den Snapshot, falls er fehlt oder veraltet ist
+    if not os.path.exists(snapshot_path):
+        print(f"FEHLER: {snapshot_path} konnte nicht geschrieben werden.", file=sys.stderr)
+        return 1
+    print(f"{snapshot_path}: kompilierter Snapshot ist aktuell.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
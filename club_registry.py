@@ -0,0 +1,121 @@
+"""Club-Registry für Matches über mehrere Clubs.
+
+clubs.json listet die Clubs mit ihrer Kursdaten-Datei und den Standardwerten für die
+Team-CH-Berechnung im Vierer:
+
+    {"clubs": [{"id": "gc-beispiel", "name": "GC Beispiel", "file": "clubs/gc-beispiel.json",
+                "foursome": {"category": "Herren", "tee": "gelb",
+                             "course_18": "18-Loch (Platz 1-18 AB)", "course_9": "9-Loch (Platz A 1-9)"}}]}
+
+Die Kursdaten eines Clubs werden erst bei der ersten Auswahl über load_course_index() geladen
+und in einem begrenzten LRU-Cache gehalten. Ohne clubs.json gibt es genau einen Club aus
+course_data.json mit den bisherigen Vierer-Standardwerten.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Mapping, NamedTuple
+
+from handicap_engine import load_course_index, snapshot_path_for
+
+
+class FoursomeDefaults(NamedTuple):
+    """Platzdaten, auf denen die Team-CH im Vierer berechnet wird."""
+    category: str
+    tee_color: str
+    course_18: str
+    course_9: str
+
+
+# Bisherige Standardwerte der App, gelten ohne Angabe in clubs.json
+LEGACY_FOURSOME_DEFAULTS = FoursomeDefaults("Herren", "gelb", "18-Loch (Platz 1-18 AB)", "9-Loch (Platz A 1-9)")
+DEFAULT_CLUB_ID = "default"
+
+
+class ClubInfo(NamedTuple):
+    club_id: str
+    name: str
+    path: str  # Pfad der course_data.json des Clubs (daneben ggf. .compiled.bin)
+    foursome: FoursomeDefaults
+
+
+class ClubRegistry:
+    """Clubs aus clubs.json; Kursdaten werden lazy geladen und in einem LRU-Cache gehalten."""
+
+    def __init__(self, clubs, maxsize=8):
+        self.clubs: Mapping[str, ClubInfo] = clubs
+        self.maxsize = maxsize
+        self.loads = 0  # Ladevorgänge (Cache-Fehlzugriffe)
+        self.hits = 0   # Zugriffe, die aus dem LRU-Cache bedient wurden
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def club(self, club_id):
+        return self.clubs[club_id]
+
+    def _file_state(self, path):
+        # Änderungszeit der JSON (ohne JSON: des Snapshots); eine Änderung lädt den Club neu.
+        # Der von load_course_index() geschriebene Snapshot selbst zählt nicht, sonst würde jeder Club zweimal geladen.
+        state_path = path if os.path.exists(path) else snapshot_path_for(path)
+        return os.path.getmtime(state_path) if os.path.exists(state_path) else None
+
+    def load(self, club_id):
+        """CourseIndex eines Clubs; Fehler von load_course_index() werden weitergereicht."""
+        club = self.clubs[club_id]
+        state = self._file_state(club.path)
+        with self._lock:
+            cached = self._loaded.get(club_id)
+            if cached is not None and cached[0] == state:
+                self._loaded.move_to_end(club_id)
+                self.hits += 1
+                return cached[1]
+        loaded = load_course_index(club.path)
+        with self._lock:
+            self.loads += 1
+            self._loaded[club_id] = (state, loaded)
+            self._loaded.move_to_end(club_id)
+            while len(self._loaded) > self.maxsize:
+                self._loaded.popitem(last=False)
+        return loaded
+
+    def loaded_club_ids(self):
+        with self._lock:
+            return list(self._loaded)
+
+
+def _foursome_defaults(raw):
+    if not raw:
+        return LEGACY_FOURSOME_DEFAULTS
+    return FoursomeDefaults(
+        raw.get("category", LEGACY_FOURSOME_DEFAULTS.category),
+        raw.get("tee", LEGACY_FOURSOME_DEFAULTS.tee_color),
+        raw.get("course_18", LEGACY_FOURSOME_DEFAULTS.course_18),
+        raw.get("course_9", LEGACY_FOURSOME_DEFAULTS.course_9),
+    )
+
+
+def load_club_registry(path="clubs.json", fallback_course_data="course_data.json", maxsize=8):
+    """Liest clubs.json (nur Metadaten, keine Kursdaten); fehlt die Datei, gibt es einen Club aus fallback_course_data.
+
+    Wirft ValueError bei ungültiger clubs.json (json.JSONDecodeError ist ein ValueError).
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        club = ClubInfo(DEFAULT_CLUB_ID, "", fallback_course_data, LEGACY_FOURSOME_DEFAULTS)
+        return ClubRegistry({club.club_id: club}, maxsize)
+
+    base_dir = os.path.dirname(path)
+    clubs = {}
+    for n, entry in enumerate(raw.get("clubs", [])):
+        if not isinstance(entry, dict) or not entry.get("id") or not entry.get("file"):
+            raise ValueError(f"clubs.json: Eintrag {n} braucht 'id' und 'file'")
+        if entry["id"] in clubs:
+            raise ValueError(f"clubs.json: Club-ID {entry['id']!r} ist doppelt")
+        clubs[entry["id"]] = ClubInfo(entry["id"], entry.get("name", entry["id"]),
+                                      os.path.join(base_dir, entry["file"]), _foursome_defaults(entry.get("foursome")))
+    if not clubs:
+        raise ValueError("clubs.json enthält keine Clubs")
+    return ClubRegistry(clubs, maxsize)
@@ -0,0 +1,571 @@
+"""Berechnungskern des Golf-Vorgabe-Rechners (URS V1.0).
+
+Enthält das Kursdatenmodell und alle Vorgabe-Formeln für FA-02 (Einzel-Matchplay)
+und FA-03 (Vierer-Matchplay). Das Modul importiert bewusst kein Streamlit, damit es
+auch aus Skripten, Batch-Läufen und Benchmarks genutzt werden kann; NumPy wird nur
+in den Batch-Funktionen bei Bedarf importiert.
+"""
+import copyreg
+import difflib
+import hashlib
+import json
+import os
+import pickle
+import re
+import zlib
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+# --- Input Validation Ranges ---
+HCPI_MIN, HCPI_MAX = -5.0, 54.0
+SLOPE_MIN, SLOPE_MAX = 55, 155
+CR_MIN, CR_MAX = 55.0, 85.0  # 18 Loch; für 9 Loch gilt jeweils die Hälfte
+PAR_MIN, PAR_MAX = 60, 78    # 18 Loch; für 9 Loch gilt jeweils die Hälfte
+
+# Übliche Abschlagsfarben; andere Farben sind erlaubt, werden beim Laden aber als möglicher Tippfehler gemeldet
+KNOWN_TEE_COLORS = ("weiss", "weiß", "gelb", "blau", "rot", "orange", "schwarz", "gruen", "grün")
+
+# Toleranz für Float-Vergleiche an den Bereichsgrenzen und HCPI-Schrittweite der Eingabe
+RANGE_EPS = 1e-9
+HCPI_STEP = 0.1
+
+
+class RangeTable(NamedTuple):
+    """Kompilierte handicapRanges eines Abschlags: nach HCPI_min sortierte Grenzen für bisect."""
+    mins: Tuple[float, ...]
+    maxs: Tuple[float, ...]
+    course_hcps: Tuple[int, ...]
+
+    def lookup(self, hcpi):
+        """CourseHCP aus der Tabelle oder None, wenn der HCPI in keinem Bereich liegt."""
+        i = bisect_right(self.mins, hcpi) - 1
+        if i >= 0 and hcpi <= self.maxs[i]:
+            return self.course_hcps[i]
+        return None
+
+    def lookup_many(self, hcpis):
+        """Vektorisierter Lookup für ein NumPy-Array von HCPIs.
+
+        Liefert (course_hcps, found): found markiert die HCPIs, die in einem Bereich liegen;
+        an den übrigen Stellen ist course_hcps 0.
+        """
+        import numpy as np
+        hcpis = np.asarray(hcpis, dtype=float)
+        if not self.mins:
+            return np.zeros(hcpis.shape, dtype=int), np.zeros(hcpis.shape, dtype=bool)
+        idx = np.searchsorted(np.asarray(self.mins), hcpis, side="right") - 1
+        safe_idx = np.clip(idx, 0, None)
+        found = (idx >= 0) & (hcpis <= np.asarray(self.maxs)[safe_idx])
+        return np.where(found, np.asarray(self.course_hcps)[safe_idx], 0), found
+
+
+EMPTY_RANGE_TABLE = RangeTable((), (), ())
+
+
+def compile_range_table(rows, label):
+    """Sortiert handicapRanges und prüft sie auf Lücken und Überschneidungen.
+
+    Wirft ValueError mit der Abschlagsbezeichnung, damit fehlerhafte Tabellen beim Laden
+    auffallen und nicht erst als falscher CH in einem Tab.
+    """
+    if not rows:
+        return EMPTY_RANGE_TABLE
+    try:
+        ordered = sorted(((float(r["HCPI_min"]), float(r["HCPI_max"]), int(r["CourseHCP"])) for r in rows), key=lambda r: r[0])
+    except KeyError as e:
+        raise ValueError(f"{label}: handicapRanges-Eintrag ohne {e}") from None
+    for lo, hi, _ in ordered:
+        if lo > hi + RANGE_EPS:
+            raise ValueError(f"{label}: Bereich {lo}..{hi} ist leer (HCPI_min > HCPI_max)")
+    for (lo1, hi1, _), (lo2, hi2, _) in zip(ordered, ordered[1:]):
+        if lo2 <= hi1 + RANGE_EPS:
+            raise ValueError(f"{label}: Bereiche {lo1}..{hi1} und {lo2}..{hi2} überschneiden sich")
+        if lo2 - hi1 > HCPI_STEP + RANGE_EPS:
+            raise ValueError(f"{label}: Lücke zwischen {hi1} und {lo2}")
+    mins, maxs, course_hcps = zip(*ordered)
+    return RangeTable(mins, maxs, course_hcps)
+
+
+class TeeData(NamedTuple):
+    """Unveränderliche Platzdaten eines Abschlags."""
+    color: str
+    SR: int
+    CR: float
+    Par: int
+    ranges: RangeTable  # EMPTY_RANGE_TABLE, wenn keine Tabelle hinterlegt ist
+    key: Tuple[str, ...] = ()  # (Datenversion, Kategorie, Platz, Farbe): Identität des Abschlags
+
+
+class CourseInfo(NamedTuple):
+    """Ein Eintrag aus courseHandicaps (Kategorie + Platz) mit seinen Abschlägen."""
+    category: str
+    holes: str       # Platzbezeichnung aus der JSON, z.B. "18-Loch (Platz 1-18 AB)"
+    hole_count: int  # 18, 9 oder 0, falls aus der Bezeichnung nicht ableitbar
+    tees: Mapping[str, TeeData]
+
+
+# --- Schlagverteilung (Stroke Index) ---
+#
+# Optional je Eintrag in courseHandicaps: "strokeIndex" (HCP-Index je Loch in Spielreihenfolge,
+# 1 = schwerstes Loch) und "holeNumbers" (Lochnummern, sonst aus der Platzbezeichnung wie "1-9"
+# bzw. 1..n). 9-Loch-Schleifen ohne eigenen strokeIndex übernehmen die Indizes ihrer Löcher vom
+# 18-Loch-Platz; zusätzlich gibt es je 18-Loch-Platz die Schleifen "Löcher 1-9" und "Löcher 10-18".
+# Die Verteilung wird beim Laden für 0 bis STROKES_PER_HOLE_PRECOMPUTED Schläge je Loch vorberechnet.
+
+STROKES_PER_HOLE_PRECOMPUTED = 4
+
+
+class StrokeTable(NamedTuple):
+    """Vorberechnete Schlagverteilung eines Platzes bzw. einer 9-Loch-Schleife."""
+    name: str
+    holes: Tuple[int, ...]         # Lochnummern in Spielreihenfolge
+    stroke_index: Tuple[int, ...]  # HCP-Index je Loch; der niedrigste Index erhält den ersten Schlag
+    rows: Tuple[Tuple[int, ...], ...]  # rows[n]: Schläge je Loch bei n Vorgabeschlägen
+
+
+def _allocation_order(stroke_index):
+    return sorted(range(len(stroke_index)), key=stroke_index.__getitem__)
+
+
+def _allocate(order, strokes):
+    """Jedes Loch erhält strokes // Lochzahl Schläge, die übrigen gehen an die Löcher mit dem niedrigsten Index."""
+    base, extra = divmod(strokes, len(order))
+    per_hole = [base] * len(order)
+    for position in order[:extra]:
+        per_hole[position] += 1
+    return tuple(per_hole)
+
+
+def compile_stroke_table(name, holes, stroke_index):
+    order = _allocation_order(stroke_index)
+    rows = tuple(_allocate(order, n) for n in range(STROKES_PER_HOLE_PRECOMPUTED * len(holes) + 1))
+    return StrokeTable(name, tuple(holes), tuple(stroke_index), rows)
+
+
+def stroke_allocation(table, strokes):
+    """Schläge je Loch (in Spielreihenfolge) für strokes Vorgabeschläge; Zeilen-Lookup, nur oberhalb der Tabelle gerechnet."""
+    if strokes < len(table.rows):
+        return table.rows[strokes]
+    return _allocate(_allocation_order(table.stroke_index), strokes)
+
+
+def _hole_numbers_from_name(holes, hole_count):
+    """Lochnummern aus einer Bezeichnung wie "9-Loch (Platz B 10-18)", sonst 1..hole_count."""
+    for first, last in re.findall(r"(\d+)\s*-\s*(\d+)", holes):
+        if int(last) - int(first) + 1 == hole_count:
+            return tuple(range(int(first), int(last) + 1))
+    return tuple(range(1, hole_count + 1))
+
+
+def _build_stroke_tables(raw_courses):
+    """{(Kategorie, Platz- bzw. Schleifenname): StrokeTable} aus den Rohdaten von courseHandicaps."""
+    tables, holes_18 = {}, []
+    for c in raw_courses:
+        hole_count = _hole_count_from_name(c["holes"])
+        numbers = tuple(c.get("holeNumbers") or _hole_numbers_from_name(c["holes"], hole_count))
+        if "strokeIndex" in c:
+            tables[(c["category"], c["holes"])] = compile_stroke_table(c["holes"], numbers, c["strokeIndex"])
+            if hole_count == 18: holes_18.append((c["category"], c["holes"], dict(zip(numbers, c["strokeIndex"]))))
+    for c in raw_courses:
+        hole_count = _hole_count_from_name(c["holes"])
+        if hole_count != 9 or (c["category"], c["holes"]) in tables: continue
+        numbers = tuple(c.get("holeNumbers") or _hole_numbers_from_name(c["holes"], hole_count))
+        source = next((si for category, _, si in holes_18 if category == c["category"] and set(numbers) <= set(si)), None)
+        if source:
+            tables[(c["category"], c["holes"])] = compile_stroke_table(c["holes"], numbers, [source[h] for h in numbers])
+    for category, name, si in holes_18:
+        numbers = list(si)
+        covered = {frozenset(t.holes) for (cat, _), t in tables.items() if cat == category and len(t.holes) == 9}
+        for loop in (numbers[:9], numbers[9:]):
+            if frozenset(loop) in covered: continue  # Schleife gibt es schon als eigenen 9-Loch-Platz
+            loop_name = f"{name}: Löcher {loop[0]}-{loop[-1]}"
+            tables[(category, loop_name)] = compile_stroke_table(loop_name, loop, [si[h] for h in loop])
+    return tables
+
+
+def stroke_tables_for(index, category, hole_count):
+    """Alle Schlagverteilungen (Plätze und 9-Loch-Schleifen) einer Kategorie mit hole_count Löchern."""
+    return tuple(table for (cat, _), table in index.stroke_tables.items() if cat == category and len(table.holes) == hole_count)
+
+
+class CourseIndex(NamedTuple):
+    """Einmalig beim Laden aufgebauter Index über courseHandicaps.
+
+    Alle Zugriffe der Tabs sind damit Dict-Lookups statt linearer Suchen
+    über die Kursliste.
+    """
+    club_name: str
+    courses: Tuple[CourseInfo, ...]
+    by_hole_count: Mapping[Tuple[str, int], CourseInfo]   # (Kategorie, 18/9) -> erster passender Platz
+    by_name: Mapping[Tuple[str, str], CourseInfo]         # (Kategorie, Platzbezeichnung) -> Platz
+    common_tees: Mapping[Tuple[str, str, str], Tuple[str, ...]]  # (Kategorie, 18-Loch-Name, 9-Loch-Name) -> Abschläge
+    version: str = ""  # Hash der course_data.json, aus der der Index gebaut wurde
+    stroke_tables: Mapping[Tuple[str, str], StrokeTable] = MappingProxyType({})  # (Kategorie, Platz/Schleife) -> Schlagverteilung
+    warnings: Tuple[str, ...] = ()  # Hinweise von validate_course_data(), z.B. unbekannte Abschlagsfarben
+
+
+EMPTY_COURSE_INDEX = CourseIndex("", (), MappingProxyType({}), MappingProxyType({}), MappingProxyType({}))
+
+
+def _hole_count_from_name(holes):
+    if "18-Loch" in holes: return 18
+    if "9-Loch" in holes: return 9
+    return 0
+
+
+def build_course_index(course_data, version=""):
+    """Baut aus den Rohdaten der course_data.json einen unveränderlichen CourseIndex.
+
+    version (z.B. ein Hash der Datei) geht in die Tee-Schlüssel ein, damit Abschläge
+    verschiedener Datenstände unterscheidbar bleiben.
+    """
+    if not course_data or "courseHandicaps" not in course_data:
+        return EMPTY_COURSE_INDEX._replace(club_name=(course_data or {}).get("golfclub", ""))
+
+    courses = []
+    by_hole_count = {}
+    by_name = {}
+    for c in course_data["courseHandicaps"]:
+        tees = MappingProxyType({
+            color: TeeData(color, t["SR"], t["CR"], t["Par"],
+                           compile_range_table(t.get("handicapRanges"), f"{c['category']} {c['holes']} {color}"),
+                           (version, c["category"], c["holes"], color))
+            for color, t in c["tees"].items()
+        })
+        course = CourseInfo(c["category"], c["holes"], _hole_count_from_name(c["holes"]), tees)
+        courses.append(course)
+        # setdefault entspricht dem bisherigen next(...): der erste passende Eintrag gewinnt
+        if course.hole_count: by_hole_count.setdefault((course.category, course.hole_count), course)
+        by_name.setdefault((course.category, course.holes), course)
+
+    common_tees = {}
+    for c18 in courses:
+        if c18.hole_count != 18: continue
+        for c9 in courses:
+            if c9.hole_count != 9 or c9.category != c18.category: continue
+            common_tees[(c18.category, c18.holes, c9.holes)] = tuple(sorted(set(c18.tees) & set(c9.tees)))
+
+    return CourseIndex(
+        club_name=course_data.get("golfclub", ""),
+        courses=tuple(courses),
+        by_hole_count=MappingProxyType(by_hole_count),
+        by_name=MappingProxyType(by_name),
+        common_tees=MappingProxyType(common_tees),
+        version=version,
+        stroke_tables=MappingProxyType(_build_stroke_tables(course_data["courseHandicaps"])),
+    )
+
+
+def find_course(index, category, hole_count=None, holes_name=None) -> Optional[CourseInfo]:
+    """O(1)-Lookup eines Platzes nach Bezeichnung oder, falls keine angegeben ist, nach Lochzahl."""
+    if holes_name is not None:
+        return index.by_name.get((category, holes_name))
+    return index.by_hole_count.get((category, hole_count))
+
+
+def find_tee(index, category, tee_color, hole_count=None, holes_name=None) -> Optional[TeeData]:
+    course = find_course(index, category, hole_count, holes_name)
+    return course.tees.get(tee_color) if course else None
+
+
+def common_tees_for(index, category, holes_18=None, holes_9=None):
+    """Gemeinsame Abschläge des 18- und 9-Loch-Platzes einer Kategorie (sortiert, vorberechnet)."""
+    c18 = find_course(index, category, 18, holes_18)
+    c9 = find_course(index, category, 9, holes_9)
+    if not c18 or not c9: return ()
+    return index.common_tees.get((category, c18.holes, c9.holes), ())
+
+
+def course_handicaps_18_many(tee, hcpis):
+    """CH18 für ein ganzes Array von HCPIs in einem Aufruf: Tabellenwert, sonst URS-Formel."""
+    import numpy as np
+    hcpis = np.asarray(hcpis, dtype=float)
+    table_ch, found = tee.ranges.lookup_many(hcpis)
+    # np.rint rundet wie round() (half-to-even), entspricht also urs_round
+    formula_ch = np.rint(hcpis * (tee.SR / 113) + (tee.CR - tee.Par)).astype(int)
+    return np.where(found, table_ch, formula_ch)
+
+
+def course_handicaps_9_many(tee, hcpis):
+    """CH9 nach Formel für ein ganzes Array von HCPIs."""
+    import numpy as np
+    hcpis = np.asarray(hcpis, dtype=float)
+    return np.rint((hcpis / 2.0) * (tee.SR / 113) + (tee.CR - tee.Par)).astype(int)
+
+
+def urs_round(n):
+    return round(n)
+
+
+# --- Course Handicap (CH) ---
+
+def course_handicap_formula_18(tee, hcpi):
+    """URS-Formel 18 Loch: HCPI * (SR / 113) + (CR - Par), gerundet."""
+    return urs_round(hcpi * (tee.SR / 113) + (tee.CR - tee.Par))
+
+
+def course_handicap_18(tee, hcpi):
+    """CH18: Wert aus den handicapRanges, falls vorhanden, sonst die URS-Formel."""
+    ch = tee.ranges.lookup(hcpi)
+    return ch if ch is not None else course_handicap_formula_18(tee, hcpi)
+
+
+def course_handicap_9(tee, hcpi):
+    """CH9 nach Formel mit halbiertem HCPI: (HCPI / 2) * (SR / 113) + (CR - Par), gerundet."""
+    return urs_round((hcpi / 2.0) * (tee.SR / 113) + (tee.CR - tee.Par))
+
+
+def table_course_handicap(tee, hcpi):
+    """CourseHCP aus den handicapRanges oder None."""
+    return tee.ranges.lookup(hcpi)
+
+
+# Berechnung je Art ("18", "9", "table"); Grundlage der Prüfungen in build_course_snapshot.py
+COMPUTE_BY_KIND = {"18": course_handicap_18, "9": course_handicap_9, "table": table_course_handicap}
+
+
+class PlayerHandicaps(NamedTuple):
+    """CH18/CH9 eines Spielers samt den verwendeten Plätzen und Abschlägen (None, wenn nicht vorhanden)."""
+    ch_18: Optional[int]
+    ch_9: Optional[int]
+    ch_9_table: Optional[int]  # informativer Tabellenwert 9 Loch
+    course_18: Optional[CourseInfo]
+    course_9: Optional[CourseInfo]
+    tee_18: Optional[TeeData]
+    tee_9: Optional[TeeData]
+
+
+def player_handicaps(index, category, hcpi, tee_color, holes_18=None, holes_9=None):
+    """CH18 und CH9 eines Spielers; ohne Platzbezeichnung wird der erste 18-/9-Loch-Platz der Kategorie genutzt."""
+    course_18 = find_course(index, category, 18, holes_18)
+    course_9 = find_course(index, category, 9, holes_9)
+    tee_18 = course_18.tees.get(tee_color) if course_18 else None
+    tee_9 = course_9.tees.get(tee_color) if course_9 else None
+    return PlayerHandicaps(
+        ch_18=course_handicap_18(tee_18, hcpi) if tee_18 else None,
+        ch_9=course_handicap_9(tee_9, hcpi) if tee_9 else None,
+        ch_9_table=table_course_handicap(tee_9, hcpi) if tee_9 else None,
+        course_18=course_18, course_9=course_9, tee_18=tee_18, tee_9=tee_9,
+    )
+
+
+# --- FA-02: Einzel-Matchplay ---
+
+class Allowance(NamedTuple):
+    """Vorgabeschläge eines Matches; receiver ist 1 oder 2 (wer die Schläge erhält) bzw. 0 bei Gleichstand."""
+    abs_diff: int
+    intermediate: float
+    strokes: int
+    receiver: int
+
+
+def _receiver(ch1, ch2):
+    if ch1 == ch2: return 0
+    return 1 if ch1 > ch2 else 2
+
+
+def matchplay_allowance(ch1, ch2):
+    """FA-02: |CH1 - CH2| * 2/3, gerundet."""
+    abs_diff = abs(ch1 - ch2)
+    intermediate = abs_diff * (2/3)
+    return Allowance(abs_diff, intermediate, urs_round(intermediate), _receiver(ch1, ch2))
+
+
+# --- FA-03: Vierer-Matchplay (Foursomes) ---
+
+def team_hcpi(hcpi_a, hcpi_b):
+    """Team-HCPI im Vierer: 60 % des niedrigeren plus 40 % des höheren HCPI, auf Hundertstel gerundet.
+
+    Bei HCPIs in 0.1-Schritten ist das exakte Ergebnis ein Vielfaches von 0.01; die Rundung entfernt nur den
+    float-Fehler (sonst z.B. 2.5000000000000004), damit Formel und handicapRanges-Grenzen denselben Wert sehen
+    wie der NumPy-Pfad team_hcpis_many, der mit denselben Operationen rechnet.
+    """
+    if hcpi_a > hcpi_b: hcpi_a, hcpi_b = hcpi_b, hcpi_a
+    return round(hcpi_a * 60 + hcpi_b * 40) / 100
+
+
+def team_hcpis_many(hcpis_a, hcpis_b):
+    """team_hcpi für ganze Arrays (NaN bleibt NaN); np.rint rundet half-to-even wie round()."""
+    import numpy as np
+    hcpis_a, hcpis_b = np.asarray(hcpis_a, dtype=float), np.asarray(hcpis_b, dtype=float)
+    return np.rint(np.minimum(hcpis_a, hcpis_b) * 60 + np.maximum(hcpis_a, hcpis_b) * 40) / 100
+
+
+def foursome_allowance(tch1, tch2):
+    """FA-03: |Team-CH1 - Team-CH2|, gerundet."""
+    abs_diff = abs(tch1 - tch2)
+    return Allowance(abs_diff, abs_diff, urs_round(abs_diff), _receiver(tch1, tch2))
+
+
+# --- Schema-Prüfung ---
+
+class CourseDataError(ValueError):
+    """course_data.json entspricht nicht dem erwarteten Schema; errors enthält alle gefundenen Fehler."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("; ".join(self.errors[:10]) + (f" (und {len(self.errors) - 10} weitere)" if len(self.errors) > 10 else ""))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check_range(errors, label, key, value, lo, hi, integral=False):
+    if not _is_number(value) or (integral and value != int(value)):
+        errors.append(f"{label}: {key} muss eine {'ganze ' if integral else ''}Zahl sein, ist {value!r}")
+    elif not lo <= value <= hi:
+        errors.append(f"{label}: {key} {value} liegt außerhalb {lo}..{hi}")
+
+
+def validate_course_data(course_data):
+    """Prüft die Struktur der course_data.json einmalig beim Laden und wirft CourseDataError mit allen Fehlern.
+
+    Fehlende SR/CR/Par-Werte oder nicht erkennbare Lochzahlen fallen damit beim Laden auf statt
+    später als KeyError in einem Tab. Unbekannte Abschlagsfarben sind kein Fehler; sie kommen als
+    Liste von Hinweisen zurück (mit Vorschlag, falls es ein Tippfehler sein könnte).
+    """
+    if not isinstance(course_data, dict):
+        raise CourseDataError(["Oberste Ebene muss ein Objekt sein"])
+    errors, warnings = [], []
+    if not isinstance(course_data.get("golfclub", ""), str):
+        errors.append("golfclub muss ein Text sein")
+    courses = course_data.get("courseHandicaps")
+    if not isinstance(courses, list) or not courses:
+        raise CourseDataError(errors + ["courseHandicaps fehlt oder ist leer"])
+
+    for n, c in enumerate(courses):
+        if not isinstance(c, dict):
+            errors.append(f"courseHandicaps[{n}] muss ein Objekt sein")
+            continue
+        category, holes = c.get("category"), c.get("holes")
+        label = f"courseHandicaps[{n}] ({category} / {holes})"
+        if not isinstance(category, str) or not category:
+            errors.append(f"{label}: category fehlt")
+        if not isinstance(holes, str) or not _hole_count_from_name(holes):
+            errors.append(f"{label}: holes muss '18-Loch' oder '9-Loch' enthalten")
+            continue
+        hole_count = _hole_count_from_name(holes)
+        scale = 1 if hole_count == 18 else 0.5
+        for key in ("strokeIndex", "holeNumbers"):
+            values = c.get(key)
+            if values is None: continue
+            if (not isinstance(values, list) or len(values) != hole_count
+                    or not all(isinstance(v, int) and not isinstance(v, bool) and 1 <= v <= 18 for v in values)):
+                errors.append(f"{label}: {key} muss {hole_count} ganze Zahlen zwischen 1 und 18 enthalten")
+            elif len(set(values)) != len(values):
+                errors.append(f"{label}: {key} enthält doppelte Werte")
+        tees = c.get("tees")
+        if not isinstance(tees, dict) or not tees:
+            errors.append(f"{label}: tees fehlt oder ist leer")
+            continue
+        for color, t in tees.items():
+            tee_label = f"{label}, Abschlag {color!r}"
+            if color not in KNOWN_TEE_COLORS:
+                suggestion = difflib.get_close_matches(str(color).lower(), KNOWN_TEE_COLORS, n=1)
+                warnings.append(f"{tee_label}: unbekannte Abschlagsfarbe" + (f", gemeint ist wohl {suggestion[0]!r}?" if suggestion else ""))
+            if not isinstance(t, dict):
+                errors.append(f"{tee_label}: muss ein Objekt sein")
+                continue
+            for key in ("SR", "CR", "Par"):
+                if key not in t: errors.append(f"{tee_label}: {key} fehlt")
+            if "SR" in t: _check_range(errors, tee_label, "SR", t["SR"], SLOPE_MIN, SLOPE_MAX, integral=True)
+            if "CR" in t: _check_range(errors, tee_label, "CR", t["CR"], CR_MIN * scale, CR_MAX * scale)
+            if "Par" in t: _check_range(errors, tee_label, "Par", t["Par"], PAR_MIN * scale, PAR_MAX * scale, integral=True)
+            ranges = t.get("handicapRanges", [])
+            if not isinstance(ranges, list):
+                errors.append(f"{tee_label}: handicapRanges muss eine Liste sein")
+                continue
+            for m, r in enumerate(ranges):
+                for key in ("HCPI_min", "HCPI_max", "CourseHCP"):
+                    if not isinstance(r, dict) or not _is_number(r.get(key)):
+                        errors.append(f"{tee_label}: handicapRanges[{m}].{key} fehlt oder ist keine Zahl")
+    if errors:
+        raise CourseDataError(errors)
+    return warnings
+
+
+# --- Kompilierter Snapshot (course_data.compiled.bin) ---
+#
+# zlib-komprimierter Pickle von (Schlüssel, CourseIndex). Der Schlüssel enthält den Hash
+# der course_data.json; passt er, entfallen Parsen, Prüfen und Kompilieren.
+# Fehlt die course_data.json (z.B. im stlite-Mount), wird der Snapshot ohne Schlüsselprüfung genutzt.
+
+SNAPSHOT_FORMAT = 4  # bei Änderungen am Inhalt des Snapshots oder an den NamedTuples des Index erhöhen
+
+def _mapping_proxy(data):
+    return MappingProxyType(data)
+
+
+# MappingProxyType ist nicht picklebar; als dict speichern und beim Laden wieder einpacken
+copyreg.pickle(MappingProxyType, lambda proxy: (_mapping_proxy, (dict(proxy),)))
+
+
+class SnapshotError(ValueError):
+    """Nur der Snapshot ist vorhanden, aber veraltet (älteres SNAPSHOT_FORMAT) oder nicht lesbar."""
+
+
+def snapshot_path_for(course_data_path):
+    return os.path.splitext(course_data_path)[0] + ".compiled.bin"
+
+
+def _read_snapshot(path, key):
+    try:
+        with open(path, "rb") as f:
+            stored_key, index = pickle.loads(zlib.decompress(f.read()))
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError, TypeError):
+        return None
+    if stored_key[0] != SNAPSHOT_FORMAT or (key is not None and stored_key != key):
+        return None
+    return index
+
+
+def write_snapshot(path, key, index):
+    """Schreibt den kompilierten Snapshot; ein schreibgeschütztes Verzeichnis ist kein Fehler."""
+    try:
+        with open(path, "wb") as f:
+            f.write(zlib.compress(pickle.dumps((key, index), protocol=pickle.HIGHEST_PROTOCOL), 6))
+    except OSError:
+        pass
+
+
+# --- Laden ---
+
+def load_course_index(path="course_data.json", use_snapshot=True):
+    """Liest course_data.json und liefert den CourseIndex.
+
+    Die Daten werden einmal mit validate_course_data() geprüft und kompiliert; das Ergebnis
+    wird als course_data.compiled.bin daneben abgelegt und bei unveränderter Datei direkt
+    geladen.
+
+    FileNotFoundError, json.JSONDecodeError und ValueError (CourseDataError, fehlerhafte
+    handicapRanges) werden an den Aufrufer weitergereicht. Fehlt die JSON und ist der Snapshot
+    veraltet, wird SnapshotError geworfen.
+    """
+    snapshot_path = snapshot_path_for(path)
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        # Nur der kompilierte Snapshot wurde ausgeliefert
+        snapshot = _read_snapshot(snapshot_path, None) if use_snapshot else None
+        if snapshot is not None:
+            return snapshot
+        if use_snapshot and os.path.exists(snapshot_path):
+            raise SnapshotError(f"{os.path.basename(snapshot_path)} ist veraltet oder beschädigt. Bitte mit "
+                                f"python build_course_snapshot.py {os.path.basename(path)} neu erzeugen.") from None
+        raise
+    version = hashlib.sha1(raw).hexdigest()
+    key = (SNAPSHOT_FORMAT, version)
+    if use_snapshot:
+        snapshot = _read_snapshot(snapshot_path, key)
+        if snapshot is not None:
+            return snapshot
+
+    course_data = json.loads(raw.decode("utf-8"))
+    warnings = validate_course_data(course_data)
+    index = build_course_index(course_data, version=version)._replace(warnings=tuple(warnings))
+    if use_snapshot:
+        write_snapshot(snapshot_path, key, index)
+    return index
@@ -0,0 +1,294 @@
+"""Aufstellungs-Optimierer für Mannschaftsmatches (Einzel FA-02 und Vierer FA-03).
+
+Aus zwei Kadern werden die Paarungen gesucht, bei denen insgesamt am wenigsten Vorgabeschläge
+gegeben werden ("minimal") bzw. die Schläge zwischen den Mannschaften möglichst ausgeglichen sind
+("ausgeglichen": Nettoschläge Team 1 minus Team 2 nahe 0, danach möglichst wenige Schläge).
+
+Einzel: ungarische Methode auf der Matrix |CH1 - CH2| * 2/3 (exakt); für "ausgeglichen" danach
+eine Tiefensuche mit Schranken, die mit der minimalen Lösung als Obergrenze startet. Vierer: Für jede Mannschaft werden die Mengen
+disjunkter Partnerschaften aufgezählt und auf ihre sortierten Team-CHs reduziert (Duplikate
+entfallen). Für feste Partnerschaften ist die Zuordnung nach sortierten Team-CHs optimal, deren
+Summe der Abstände ist nie kleiner als der Abstand der Summen; danach wird die Suche beschnitten.
+
+Beide Suchen halten ein Zeitbudget ein und liefern dann die beste bisher gefundene Aufstellung
+(optimal=False). submit() startet die Suche in einem Hintergrund-Thread.
+"""
+import bisect
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple, Tuple
+
+from tournament_batch import partnerships
+
+OBJECTIVES = ("minimal", "ausgeglichen")
+DEFAULT_TIME_BUDGET = 5.0  # Sekunden
+_CHECK_EVERY = 512  # Zeitbudget/Abbruch nur alle n Schritte prüfen
+
+
+class LineupMatch(NamedTuple):
+    team_1: str
+    team_2: str
+    ch_1: int
+    ch_2: int
+    strokes: int
+    receiver: int  # 1 oder 2 (wer die Schläge erhält), 0 bei Gleichstand
+
+
+class LineupResult(NamedTuple):
+    matches: Tuple[LineupMatch, ...]
+    total_strokes: int
+    net_strokes: int  # von Team 1 erhaltene minus von Team 2 erhaltene Schläge
+    optimal: bool  # False, wenn das Zeitbudget vor Ende der Suche aufgebraucht war
+    evaluated: int
+    seconds: float
+
+
+class _Budget:
+    def __init__(self, seconds, cancel=None):
+        self.start = time.perf_counter()
+        self.deadline = self.start + seconds
+        self.cancel = cancel
+        self.steps = 0
+        self.exhausted = False
+        self.truncated = False  # eine Teilsuche wurde am Teil-Limit abgebrochen
+
+    def tick(self, until=None):
+        """True, solange weitergesucht werden darf; until ist ein früheres Teil-Limit (perf_counter)."""
+        self.steps += 1
+        if self.steps % _CHECK_EVERY == 0:
+            now = time.perf_counter()
+            if now > self.deadline or (self.cancel is not None and self.cancel.is_set()):
+                self.exhausted = True
+            elif until is not None and now > until:
+                self.truncated = True
+                return False
+        return not self.exhausted
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+def _key(objective, net, total):
+    return (abs(net), total) if objective == "ausgeglichen" else (total, abs(net))
+
+
+def _match(name_1, name_2, ch_1, ch_2, strokes):
+    receiver = 0 if ch_1 == ch_2 else (1 if ch_1 > ch_2 else 2)
+    return LineupMatch(name_1, name_2, ch_1, ch_2, strokes, receiver)
+
+
+def _result(matches, optimal, budget):
+    total = sum(m.strokes for m in matches)
+    net = sum(m.strokes if m.receiver == 1 else -m.strokes for m in matches if m.receiver)
+    return LineupResult(tuple(matches), total, net, optimal, budget.steps, budget.elapsed())
+
+
+# --- Einzel ---
+
+def hungarian(cost):
+    """Zuordnung minimaler Summe für eine n×m-Kostenmatrix mit n <= m; liefert die Spalte je Zeile."""
+    n, m = len(cost), len(cost[0])
+    inf = float("inf")
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    p, way = [0] * (m + 1), [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0], j0 = i, 0
+        minv, used = [inf] * (m + 1), [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0, delta, j1 = p[j0], inf, 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if cur < minv[j]: minv[j], way[j] = cur, j0
+                    if minv[j] < delta: delta, j1 = minv[j], j
+            for j in range(m + 1):
+                if used[j]: u[p[j]] += delta; v[j] -= delta
+                else: minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0: break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    assignment = [0] * n
+    for j in range(1, m + 1):
+        if p[j]: assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def _players(roster_ch, holes):
+    """[(Name, CH)] der Spieler mit ermitteltem CH."""
+    valid = roster_ch[roster_ch[f"ch{holes}"].notna()]
+    return [(name, int(ch)) for name, ch in zip(valid["name"], valid[f"ch{holes}"])]
+
+
+def _balanced_assignment(strokes, signed, start, budget):
+    """Tiefensuche mit Schranken für "ausgeglichen"; start (die minimale Lösung) ist die erste Obergrenze.
+
+    Schranke je Teilzuordnung: kleinster noch erreichbarer Betrag der Nettoschläge (aus Minimum/Maximum
+    der restlichen Zeilen) und die Summe der kleinsten restlichen Schläge.
+    """
+    n, m = len(strokes), len(strokes[0])
+    net_min, net_max, total_min = [0] * (n + 1), [0] * (n + 1), [0] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        net_min[i] = net_min[i + 1] + min(signed[i])
+        net_max[i] = net_max[i + 1] + max(signed[i])
+        total_min[i] = total_min[i + 1] + min(strokes[i])
+    best = [_key("ausgeglichen", sum(signed[i][j] for i, j in enumerate(start)), sum(strokes[i][j] for i, j in enumerate(start))), list(start)]
+    used, assign = [False] * m, [0] * n
+
+    def search(i, net, total):
+        if not budget.tick(): return
+        if i == n:
+            if (abs(net), total) < best[0]: best[:] = [(abs(net), total), list(assign)]
+            return
+        lo, hi = net + net_min[i], net + net_max[i]
+        if (0 if lo <= 0 <= hi else min(abs(lo), abs(hi)), total + total_min[i]) >= best[0]: return
+        for j in sorted(range(m), key=lambda j: (abs(net + signed[i][j]), strokes[i][j])):
+            if used[j]: continue
+            used[j], assign[i] = True, j
+            search(i + 1, net + signed[i][j], total + strokes[i][j])
+            used[j] = False
+
+    search(0, 0, 0)
+    return best[1]
+
+
+def optimize_singles(roster_ch_1, roster_ch_2, holes="18", objective="minimal", time_budget=DEFAULT_TIME_BUDGET, cancel=None):
+    """Einzel-Aufstellung: jeder Spieler der kleineren Mannschaft spielt genau ein Match.
+
+    roster_ch_* kommen aus tournament_batch.roster_course_handicaps(); Spieler ohne CH spielen nicht mit.
+    """
+    budget = _Budget(time_budget, cancel)
+    side_1, side_2 = _players(roster_ch_1, holes), _players(roster_ch_2, holes)
+    if not side_1 or not side_2:
+        return _result([], True, budget)
+    swapped = len(side_1) > len(side_2)
+    rows, cols = (side_2, side_1) if swapped else (side_1, side_2)
+    # Schläge je Paarung wie matchplay_allowance: |CH1 - CH2| * 2/3, half-to-even gerundet
+    strokes = [[round(abs(a - b) * (2 / 3)) for _, b in cols] for _, a in rows]
+    signed = [[s if a > b else -s for s, (_, b) in zip(row, cols)] for row, (_, a) in zip(strokes, rows)]
+
+    assignment = hungarian(strokes)
+    if objective == "ausgeglichen":
+        assignment = _balanced_assignment(strokes, signed, assignment, budget)
+
+    matches = []
+    for i, j in enumerate(assignment):
+        (name_r, ch_r), (name_c, ch_c) = rows[i], cols[j]
+        if swapped: matches.append(_match(name_c, name_r, ch_c, ch_r, strokes[i][j]))
+        else: matches.append(_match(name_r, name_c, ch_r, ch_c, strokes[i][j]))
+    return _result(matches, not budget.exhausted, budget)
+
+
+# --- Vierer ---
+
+def _pair_sets(players, k):
+    """Alle Mengen von k disjunkten Paaren aus players; überzählige Spieler setzen aus."""
+    def rec(remaining, k, skips):
+        if k == 0:
+            yield ()
+            return
+        if len(remaining) < 2 * k:
+            return
+        first, rest = remaining[0], remaining[1:]
+        for n, partner in enumerate(rest):
+            for tail in rec(rest[:n] + rest[n + 1:], k - 1, skips):
+                yield ((first, partner),) + tail
+        if skips > 0:
+            yield from rec(rest, k, skips - 1)
+    yield from rec(tuple(players), k, len(players) - 2 * k)
+
+
+def _team_ch_vectors(team_ch, players, k, budget, until):
+    """{sortierte Team-CHs: Partnerschaften} je unterschiedlicher Aufstellung einer Mannschaft; Aufzählung bis until."""
+    vectors = {}
+    for pair_set in _pair_sets(players, k):
+        if not budget.tick(until): break
+        if any(pair not in team_ch for pair in pair_set): continue
+        ordered = sorted(pair_set, key=team_ch.get)
+        vectors.setdefault(tuple(team_ch[pair] for pair in ordered), tuple(ordered))
+    return vectors
+
+
+def optimize_foursomes(roster_ch_1, roster_ch_2, index, foursome_defaults, holes="18", objective="minimal",
+                       time_budget=DEFAULT_TIME_BUDGET, cancel=None):
+    """Vierer-Aufstellung: Partnerschaften beider Mannschaften und ihre Paarung, je min(N1, N2) // 2 Matches.
+
+    Team-CH wie FA-03 (Team-HCPI 60/40 auf den Standard-Platzdaten foursome_defaults des Clubs).
+    """
+    budget = _Budget(time_budget, cancel)
+    k = min(len(roster_ch_1), len(roster_ch_2)) // 2
+    sides = []
+    for share, roster_ch in ((1 / 3, roster_ch_1), (2 / 3, roster_ch_2)):
+        # je Mannschaft höchstens ein Drittel des Zeitbudgets für die Aufzählung, der Rest für die Paarung
+        partners = partnerships(roster_ch, index, *foursome_defaults)
+        partners = partners[partners[f"team_ch{holes}"].notna()]
+        team_ch = {(a, b): int(ch) for a, b, ch in zip(partners["nr_1"], partners["nr_2"], partners[f"team_ch{holes}"])}
+        until = budget.start + time_budget * share
+        sides.append((list(roster_ch["name"]), team_ch, _team_ch_vectors(team_ch, range(len(roster_ch)), k, budget, until)))
+    (names_1, _, vectors_1), (names_2, _, vectors_2) = sides
+    if k == 0 or not vectors_1 or not vectors_2:
+        return _result([], not (budget.exhausted or budget.truncated), budget)
+
+    # Team 2 nach Summe der Team-CHs sortiert; |Summe1 - Summe2| ist untere Schranke der Schläge und gleich den Nettoschlägen
+    candidates = sorted((sum(v), v) for v in vectors_2)
+    sums_2 = [s for s, _ in candidates]
+    best, best_pair = None, None
+    for vector_1 in vectors_1:
+        if budget.exhausted: break
+        sum_1 = sum(vector_1)
+        lo = bisect.bisect_left(sums_2, sum_1) - 1
+        hi = lo + 1
+        while (lo >= 0 or hi < len(candidates)) and budget.tick():
+            # immer den Kandidaten mit der näheren Summe zuerst
+            if hi >= len(candidates) or (lo >= 0 and sum_1 - sums_2[lo] <= sums_2[hi] - sum_1):
+                sum_2, vector_2 = candidates[lo]; lo -= 1
+            else:
+                sum_2, vector_2 = candidates[hi]; hi += 1
+            bound = abs(sum_1 - sum_2)
+            if best is not None and bound > best[0]:
+                break  # alle weiteren Kandidaten liegen noch weiter weg
+            key = _key(objective, sum_1 - sum_2, sum(abs(a - b) for a, b in zip(vector_1, vector_2)))
+            if best is None or key < best:
+                best, best_pair = key, (vector_1, vector_2)
+
+    if best_pair is None:
+        return _result([], False, budget)
+    vector_1, vector_2 = best_pair
+    matches = []
+    for pair_1, pair_2, ch_1, ch_2 in zip(vectors_1[vector_1], vectors_2[vector_2], vector_1, vector_2):
+        label_1 = " / ".join(names_1[p] for p in pair_1)
+        label_2 = " / ".join(names_2[p] for p in pair_2)
+        matches.append(_match(label_1, label_2, ch_1, ch_2, abs(ch_1 - ch_2)))
+    return _result(matches, not (budget.exhausted or budget.truncated), budget)
+
+
+# --- Hintergrund-Ausführung ---
+
+# Pyodide (stlite) kann keine Threads starten; dort wird gar nicht erst ein Executor angelegt
+THREADS_SUPPORTED = sys.platform != "emscripten"
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit(func, *args, **kwargs):
+    """Startet func in einem Hintergrund-Thread und liefert ein Future.
+
+    Ohne Thread-Unterstützung (Pyodide/stlite) wird synchron innerhalb des Zeitbudgets gerechnet.
+    """
+    global _executor
+    if THREADS_SUPPORTED:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="aufstellung")
+        return _executor.submit(func, *args, **kwargs)
+    future = Future()
+    try:
+        future.set_result(func(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
@@ -0,0 +1,107 @@
+"""Opt-in-Profiling der Streamlit-Reruns (Debug-Modus, ?debug=1 oder GOLF_DEBUG=1).
+
+Ein RerunProfiler sammelt je Lauf die Zeiten der Abschnitte (section), die Aufrufe und Zeiten
+der Helfer (timed) und die Änderung von Zählern wie den Cache-Treffern. Verschachtelte Abschnitte
+werden unter ihrem Pfad ("Außen › Innen") gespeichert; ihre Zeit ist in der des äußeren Abschnitts
+enthalten. Volle Reruns sind ein Lauf; Fragmente, die allein neu laufen, erzeugen einen eigenen Lauf. Die Läufe werden in einer
+Liste gesammelt (in der App: st.session_state) und lassen sich als JSON exportieren, um z.B. die
+Pyodide-PWA mit der serverseitigen Streamlit-App zu vergleichen. Ist der Profiler deaktiviert,
+sind section und timed wirkungslos und kosten nichts. Das Modul importiert kein Streamlit.
+"""
+import functools
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+MAX_HISTORY = 50  # gespeicherte Läufe je Session
+SECTION_SEPARATOR = " › "  # trennt im Abschnittsnamen äußere und verschachtelte Abschnitte
+
+
+def runtime_name():
+    return "pyodide" if sys.platform == "emscripten" else "server"
+
+
+class RerunProfiler:
+    def __init__(self, enabled, history=None, counters=None, max_history=MAX_HISTORY):
+        self.enabled = enabled
+        self.history = history if history is not None else []
+        self.counters = counters or dict  # liefert {Name: Zählerstand}, gespeichert wird die Differenz je Lauf
+        # Geteilte Zähler (z.B. einer prozessweiten Registry) enthalten auch Änderungen anderer Sessions;
+        # der Aufrufer gibt den Geltungsbereich in export_json(counter_scope=...) an.
+        self.max_history = max_history
+        self.current = None
+        self._open_sections = []  # Namen der gerade laufenden Abschnitte, außen zuerst
+
+    def begin(self, label):
+        """Startet einen Lauf; False, wenn schon einer läuft oder der Profiler deaktiviert ist."""
+        if not self.enabled or self.current is not None:
+            return False
+        self.current = {"label": label, "runtime": runtime_name(), "started": time.time(), "sections": {}, "helpers": {},
+                        "_start": time.perf_counter(), "_counters": self.counters()}
+        return True
+
+    def end(self):
+        """Beendet den laufenden Lauf, hängt ihn an history an und liefert ihn."""
+        run, self.current = self.current, None
+        if run is None:
+            return None
+        run["ms"] = (time.perf_counter() - run.pop("_start")) * 1000
+        before, after = run.pop("_counters"), self.counters()
+        run["counters"] = {name: value - before.get(name, 0) for name, value in after.items()}
+        self.history.append(run)
+        del self.history[:-self.max_history]
+        return run
+
+    @contextmanager
+    def section(self, name):
+        """Misst einen Abschnitt; außerhalb eines Laufs (Fragment-Rerun) als eigener Lauf."""
+        if not self.enabled:
+            yield
+            return
+        own_run = self.begin(f"Fragment: {name}")
+        self._open_sections.append(name)
+        path = SECTION_SEPARATOR.join(self._open_sections)
+        self.current["sections"].setdefault(path, 0.0)  # Reihenfolge nach Beginn: äußere vor inneren Abschnitten
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._open_sections.pop()
+            self.current["sections"][path] += (time.perf_counter() - start) * 1000
+            if own_run: self.end()
+
+    def profiled(self, name):
+        """Decorator: die ganze Funktion als Abschnitt name messen (z.B. eine Tab-Funktion)."""
+        def decorator(func):
+            if not self.enabled:
+                return func
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.section(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def timed(self, func, name=None):
+        """Zählt Aufrufe und Zeit eines Helfers im laufenden Lauf; deaktiviert wird func unverändert zurückgegeben."""
+        if not self.enabled:
+            return func
+        name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if self.current is not None:
+                    calls, total_ms = self.current["helpers"].get(name, (0, 0.0))
+                    self.current["helpers"][name] = (calls + 1, total_ms + (time.perf_counter() - start) * 1000)
+        return wrapper
+
+    def export_json(self, **environment):
+        """Alle gesammelten Läufe als JSON, mit Angaben zur Umgebung (Laufzeit, Versionen)."""
+        environment.setdefault("runtime", runtime_name())
+        environment.setdefault("python", sys.version.split()[0])
+        return json.dumps({"environment": environment, "runs": self.history}, ensure_ascii=False, indent=1)
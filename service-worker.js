@@ -1,19 +1,81 @@
-const CACHE_NAME = 'golf-rechner-cache-v3'; // Version erhöhen bei wichtigen Änderungen
+const CACHE_NAME = 'golf-rechner-cache-v11'; // Version erhöhen bei wichtigen Änderungen
+// Eigener Cache für die versionierten stlite-/Pyodide-Dateien (mehrere MB). Er bleibt erhalten, wenn
+// CACHE_NAME wegen App-Änderungen erhöht wird, und wird nur bei einem stlite-/Pyodide-Update neu befüllt.
+const STLITE_VERSION = '0.73.1'; // wie in index.html; bringt Streamlit 1.41 (st.fragment) mit
+const PYODIDE_VERSION = '0.26.4'; // von stlite STLITE_VERSION geladene Pyodide-Version (siehe stlite-Changelog)
+const RUNTIME_CACHE_NAME = `golf-rechner-runtime-stlite-${STLITE_VERSION}-pyodide-${PYODIDE_VERSION}`;
+const STLITE_BASE = `https://cdn.jsdelivr.net/npm/@stlite/mountable@${STLITE_VERSION}/build/`;
+const PYODIDE_BASE = `https://cdn.jsdelivr.net/pyodide/v${PYODIDE_VERSION}/full/`;
+
+// App-Shell: muss vollständig vorhanden sein, cache.addAll ist atomar
 const urlsToCache = [
   '.', // Alias für index.html
   'index.html',
   'streamlit_app.py', // Wichtig, damit stlite die App-Logik hat
+  'handicap_engine.py', // Berechnungskern, wird von streamlit_app.py importiert
+  'tournament_batch.py', // Turnier-Batch (CSV/Excel-Auslosungen)
+  'club_registry.py', // Club-Registry (clubs.json), lädt Kursdaten je Club bei Bedarf
+  'lineup_optimizer.py', // Aufstellungs-Optimierer für Mannschaftsmatches
+  'rerun_profiler.py', // Rerun-Profiling im Debug-Modus (?debug=1)
   'manifest.json',
-  'icon-192x192.png',
-  'icon-512x512.png',
-  'icon-maskable-192x192.png',
-  'icon-maskable-512x512.png',
-  // CDN-Dateien für stlite (werden gecacht, nachdem sie einmal geladen wurden)
-  'https://cdn.jsdelivr.net/npm/@stlite/mountable@0.41.0/build/stlite.css',
-  'https://cdn.jsdelivr.net/npm/@stlite/mountable@0.41.0/build/stlite.js'
-  // Die Pyodide-Kern-Dateien werden von stlite.js dynamisch geladen und dann vom Browser-HTTP-Cache verwaltet.
-  // Explizites Cachen hier ist komplexer und oft nicht nötig für den Start.
+  'icon_x192.png',
+  'icon_x512.png',
+  'maskable_icon_x192.png',
+  'maskable_icon_x512.png',
+  STLITE_BASE + 'stlite.css',
+  STLITE_BASE + 'stlite.js'
+];
+
+// Daten und Laufzeit: werden einzeln vorgeladen, ein Fehler (z.B. noch nicht erzeugte
+// course_data.compiled.bin) verhindert die Installation nicht
+// clubs.json wird erst vorgeladen, wenn sie in index.html gemountet ist (mehrere Clubs), dann hier ergänzen
+const optionalUrlsToCache = [
+  'course_data.compiled.bin'
 ];
+const runtimeUrlsToCache = [
+  PYODIDE_BASE + 'pyodide.js',
+  PYODIDE_BASE + 'pyodide.asm.js',
+  PYODIDE_BASE + 'pyodide.asm.wasm',
+  PYODIDE_BASE + 'python_stdlib.zip',
+  PYODIDE_BASE + 'pyodide-lock.json'
+];
+// Pyodide-Pakete, die streamlit beim Start importiert; die exakten Wheel-Dateien samt Abhängigkeiten
+// stehen in pyodide-lock.json und werden daraus bei der Installation ermittelt (pyodideWheelUrls).
+const PYODIDE_PACKAGES = ['micropip', 'packaging', 'numpy', 'pandas', 'pyarrow', 'pillow'];
+
+// Versionierte CDN-Pfade sind unveränderlich und werden cache-first aus RUNTIME_CACHE_NAME bedient,
+// das schließt auch die von stlite nachgeladenen Wheels (streamlit, stlite-server) und die von micropip
+// über PyPI geladenen Wheels (Dateinamen mit Version) ein.
+const PYPI_FILES_BASE = 'https://files.pythonhosted.org/packages/';
+function isVersionedRuntimeUrl(url) {
+  return url.startsWith(STLITE_BASE) || url.startsWith(PYODIDE_BASE) || url.startsWith(PYPI_FILES_BASE);
+}
+
+// Wheel-URLs der PYODIDE_PACKAGES und ihrer Abhängigkeiten laut pyodide-lock.json (zuvor in RUNTIME_CACHE_NAME abgelegt)
+function pyodideWheelUrls() {
+  return caches.open(RUNTIME_CACHE_NAME)
+    .then(cache => cache.match(PYODIDE_BASE + 'pyodide-lock.json'))
+    .then(response => response ? response.json() : { packages: {} })
+    .then(lock => {
+      const files = new Set();
+      const visit = name => {
+        const pkg = lock.packages[name];
+        if (!pkg || files.has(pkg.file_name)) return;
+        files.add(pkg.file_name);
+        (pkg.depends || []).forEach(visit);
+      };
+      PYODIDE_PACKAGES.forEach(visit);
+      return Array.from(files, file => PYODIDE_BASE + file);
+    });
+}
+
+function addAllSettled(cacheName, urls) {
+  return caches.open(cacheName).then(cache => Promise.all(urls.map(url =>
+    cache.match(url).then(hit => hit || cache.add(url)).catch(err => {
+      console.warn('Optional resource not cached:', url, err);
+    })
+  )));
+}
 
 self.addEventListener('install', event => {
   self.skipWaiting(); // Erzwingt die Aktivierung des neuen Service Workers
@@ -23,13 +85,16 @@ self.addEventListener('install', event => {
         console.log('Opened cache and caching urls:', urlsToCache);
         return cache.addAll(urlsToCache);
       })
+      .then(() => Promise.all([
+        addAllSettled(CACHE_NAME, optionalUrlsToCache),
+        addAllSettled(RUNTIME_CACHE_NAME, runtimeUrlsToCache)
+          .then(pyodideWheelUrls)
+          .then(urls => addAllSettled(RUNTIME_CACHE_NAME, urls))
+      ]))
       .catch(err => {
         console.error('Failed to cache basic resources during install:', err);
-        // Selbst wenn einige optionale Ressourcen nicht gecacht werden können (z.B. Icons, falls noch nicht vorhanden),
-        // sollte der Service Worker trotzdem installiert werden.
-        // cache.addAll ist atomar, d.h. wenn eine Datei fehlt, schlägt es komplett fehl.
-        // Für robustere Implementierung könnte man Dateien einzeln hinzufügen und Fehler ignorieren.
-        // Hier vereinfacht für den Start. Stellen Sie sicher, dass alle urlsToCache existieren.
+        // cache.addAll ist atomar, d.h. wenn eine Datei aus urlsToCache fehlt, schlägt es komplett fehl.
+        // Optionale Dateien und die Laufzeit werden deshalb getrennt über addAllSettled geladen.
       })
   );
 });
@@ -40,6 +105,20 @@ self.addEventListener('fetch', event => {
     return;
   }
 
+  if (isVersionedRuntimeUrl(event.request.url)) {
+    event.respondWith(
+      caches.open(RUNTIME_CACHE_NAME).then(cache =>
+        cache.match(event.request).then(response => response || fetch(event.request).then(networkResponse => {
+          if (networkResponse && networkResponse.status === 200) {
+            cache.put(event.request, networkResponse.clone());
+          }
+          return networkResponse;
+        }))
+      )
+    );
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request)
       .then(response => {
@@ -78,7 +157,7 @@ self.addEventListener('fetch', event => {
 });
 
 self.addEventListener('activate', event => {
-  const cacheWhitelist = [CACHE_NAME];
+  const cacheWhitelist = [CACHE_NAME, RUNTIME_CACHE_NAME];
   event.waitUntil(
     caches.keys().then(cacheNames => {
       return Promise.all(
@@ -1,62 +1,245 @@
 import streamlit as st
 import math
 import json # Importieren des json-Moduls
-
-# Globale Variable für geladene Kursdaten
-COURSE_DATA = None
-
-def load_course_data():
-    """Lädt die Kursdaten aus der JSON-Datei."""
-    global COURSE_DATA
-    if COURSE_DATA is None:
-        try:
-            with open("course_data.json", "r", encoding="utf-8") as f:
-                COURSE_DATA = json.load(f)
-        except FileNotFoundError:
-            st.error("Fehler: course_data.json nicht gefunden. Bitte stellen Sie sicher, dass die Datei im Projektordner liegt und in index.html korrekt referenziert ist.")
-            COURSE_DATA = {} # Leeres Dict, um weitere Fehler zu vermeiden
-        except json.JSONDecodeError:
-            st.error("Fehler: course_data.json enthält ungültiges JSON.")
-            COURSE_DATA = {}
-    return COURSE_DATA
-
-def urs_round(n):
-    return round(n)
+import os
+import sys
+import threading
+
+from club_registry import load_club_registry
+from handicap_engine import (
+    EMPTY_COURSE_INDEX, HCPI_MAX, HCPI_MIN, SnapshotError, common_tees_for, course_handicap_18, course_handicap_9,
+    find_tee, foursome_allowance, matchplay_allowance, player_handicaps, snapshot_path_for, stroke_allocation,
+    stroke_tables_for, table_course_handicap, team_hcpi,
+)
+from rerun_profiler import SECTION_SEPARATOR, RerunProfiler
+
+# Größe des LRU-Caches für die Kursdaten der Clubs (geladen wird ein Club erst bei seiner Auswahl)
+CLUB_CACHE_SIZE = 8
+
+
+@st.cache_resource(max_entries=1)
+def _load_club_registry(mtime=None):
+    """Liest clubs.json einmalig; st.cache_resource hält die Registry samt ihrem Club-Cache über Reruns hinweg.
+
+    mtime ist Teil des Cache-Schlüssels, eine geänderte clubs.json wird dadurch neu gelesen; max_entries=1
+    gibt dabei die alte Registry samt ihren geladenen Clubs frei.
+    """
+    return load_club_registry("clubs.json", "course_data.json", maxsize=CLUB_CACHE_SIZE)
+
+
+def load_course_data(registry, club):
+    """Liefert den CourseIndex eines Clubs; die Registry lädt ihn beim ersten Zugriff und hält ihn im LRU-Cache."""
+    data_file = os.path.basename(club.path)
+    try:
+        return registry.load(club.club_id)
+    except SnapshotError as e: # nur die .compiled.bin ist ausgeliefert, aber in einem alten Format
+        st.error(f"Fehler: {e}")
+    except FileNotFoundError:
+        snapshot_file = os.path.basename(snapshot_path_for(club.path))
+        st.error(f"Fehler: weder {data_file} noch {snapshot_file} gefunden. Die PWA lädt nur {snapshot_file}: "
+                 f"bitte mit python build_course_snapshot.py {data_file} erzeugen und in index.html unter files eintragen.")
+    except json.JSONDecodeError:
+        st.error(f"Fehler: {data_file} enthält ungültiges JSON.")
+    except ValueError as e: # CourseDataError oder fehlerhafte handicapRanges
+        st.error(f"Fehler in {data_file}: {e}")
+    return EMPTY_COURSE_INDEX # Leerer Index, um weitere Fehler zu vermeiden
+
+
+def debug_mode_requested():
+    """Debug-Modus über ?debug=1 in der URL oder die Umgebungsvariable GOLF_DEBUG=1."""
+    if os.environ.get("GOLF_DEBUG", "0") not in ("", "0"): return True
+    query_params = getattr(st, "query_params", None)
+    if query_params is not None:
+        value = query_params.get("debug")
+    else: # ältere Streamlit-/stlite-Versionen
+        value = (st.experimental_get_query_params().get("debug") or [None])[0]
+    return value not in (None, "", "0")
+
+
+def render_profile_sidebar(profiler, run):
+    """Zeiten des letzten vollen Reruns, Cache-Zähler und Export aller Läufe dieser Session in der Sidebar."""
+    with st.sidebar:
+        st.header("Debug: Rerun-Profil")
+        st.caption(f"Laufzeit: {run['runtime']} (Python {sys.version.split()[0]}, Streamlit {st.__version__}). "
+                   f"Rerun gesamt: {run['ms']:.1f} ms")
+        if not FRAGMENTS_SUPPORTED:
+            st.warning("Diese Streamlit-Version unterstützt keine Fragmente: jede Eingabe startet einen vollen Rerun.")
+        # Verschachtelte Abschnitte eingerückt; ihre Zeit steckt schon im äußeren Abschnitt
+        st.markdown("\n".join(["| Abschnitt | ms |", "|---|---:|"]
+                               + [f"| {'&nbsp;&nbsp;&nbsp;&nbsp;↳ ' * path.count(SECTION_SEPARATOR)}{path.split(SECTION_SEPARATOR)[-1]} | {ms:.1f} |"
+                                  for path, ms in run["sections"].items()]))
+        if any(SECTION_SEPARATOR in path for path in run["sections"]):
+            st.caption("Eingerückte Abschnitte sind in der Zeit des übergeordneten Abschnitts enthalten.")
+        if run["helpers"]:
+            st.markdown("\n".join(["| Helfer | Aufrufe | ms | µs/Aufruf |", "|---|---:|---:|---:|"]
+                                   + [f"| {name} | {calls} | {ms:.2f} | {ms * 1000 / calls:.1f} |"
+                                      for name, (calls, ms) in sorted(run["helpers"].items(), key=lambda item: -item[1][1])]))
+        st.caption(f"Zähler {PROFILE_COUNTER_SCOPE}: " + ", ".join(f"{name} {delta:+d}" for name, delta in run["counters"].items()))
+        fragment_runs = [r for r in profiler.history if r["label"] != "Rerun"][-10:]
+        if fragment_runs:
+            st.caption("Letzte Fragment-Reruns: " + ", ".join(f"{r['label'][len('Fragment: '):]} {r['ms']:.1f} ms" for r in fragment_runs))
+        st.download_button("Profil als JSON exportieren", profiler.export_json(streamlit=st.__version__, counter_scope=PROFILE_COUNTER_SCOPE).encode("utf-8"),
+                           file_name=f"rerun_profil_{run['runtime']}.json", mime="application/json", key="debug_profile_export")
 
 st.set_page_config(page_title="Golf-Vorgabe-Rechner", layout="wide")
 
 st.title("Golf-Vorgabe-Rechner ⛳")
+try:
+    club_registry = _load_club_registry(os.path.getmtime("clubs.json") if os.path.exists("clubs.json") else None)
+except ValueError as e:
+    st.error(f"Fehler: {e}")
+    st.stop()
+
+# Debug-Modus: Zeiten je Abschnitt und Helfer sowie Zähler je Rerun, Anzeige in der Sidebar.
+# Ohne Debug-Modus sind section/profiled/timed wirkungslos. Die Läufe liegen in st.session_state,
+# Fragment-Reruns erscheinen dort als eigene Läufe. Die Zähler gehören zur Club-Registry, die sich alle
+# Sessions des Prozesses teilen; ihre Differenzen enthalten auf dem Server auch Zugriffe anderer Sessions.
+PROFILE_COUNTER_SCOPE = "prozessweit (alle Sessions)"
+
+def _profile_counters():
+    return {"Club-Cache Treffer": club_registry.hits, "Club-Ladevorgänge": club_registry.loads}
+
+debug_mode = debug_mode_requested()
+profiler = RerunProfiler(debug_mode, st.session_state.setdefault("debug_profile", []) if debug_mode else None, _profile_counters)
+profiler.begin("Rerun")
+if debug_mode: # Engine-Helfer im Skript-Namensraum ersetzen; das Skript importiert sie bei jedem Rerun neu
+    common_tees_for, course_handicap_18, course_handicap_9, find_tee, foursome_allowance, matchplay_allowance, \
+        player_handicaps, stroke_allocation, table_course_handicap, team_hcpi = (profiler.timed(func) for func in (
+            common_tees_for, course_handicap_18, course_handicap_9, find_tee, foursome_allowance, matchplay_allowance,
+            player_handicaps, stroke_allocation, table_course_handicap, team_hcpi))
+
+# Clubauswahl nur bei mehreren Clubs; ohne clubs.json gibt es genau einen Club aus course_data.json
+club_ids = list(club_registry.clubs)
+selected_club_id = club_ids[0]
+if len(club_ids) > 1:
+    selected_club_id = st.selectbox("Club:", club_ids, format_func=lambda club_id: club_registry.club(club_id).name, key="club_id")
+selected_club = club_registry.club(selected_club_id)
+
 # Das Laden hier stellt sicher, dass der Clubname im Titel verfügbar ist, wenn benötigt.
 # Und dass die Fehlerbehandlung frühzeitig stattfindet.
-club_data_for_title = load_course_data() 
-club_name_for_title = club_data_for_title.get('golfclub', 'Clubdaten nicht geladen')
+with profiler.section("Clubdaten laden"):
+    course_index = load_course_data(club_registry, selected_club)
+club_name_for_title = course_index.club_name or selected_club.name or 'Clubdaten nicht geladen'
 
 st.caption(f"URS V1.0. Daten für Einzelmatchplay: {club_name_for_title}")
+if course_index.warnings:
+    st.warning("Hinweise zu den Kursdaten: " + "; ".join(course_index.warnings))
+
+
+# Input Validation Ranges (HCPI_MIN/HCPI_MAX, SLOPE/CR/PAR) liegen in handicap_engine
+# Standardwerte für die Team-CH-Berechnung im Vierer kommen je Club aus clubs.json (club.foursome)
+
+# --- Fragmente ---
+# st.fragment (bzw. st.experimental_fragment ab Streamlit 1.33) lässt bei einer Eingabe nur den
+# betroffenen Teil neu laufen statt des ganzen Skripts. Die PWA braucht dafür ein stlite, das Streamlit
+# 1.33 oder neuer mitbringt (Version in index.html); ohne Fragment-Unterstützung verhalten sich die Funktionen wie normale Funktionen mit
+# vollem Rerun, der Debug-Modus (?debug=1) zeigt das an.
+FRAGMENTS_SUPPORTED = hasattr(st, "fragment") or hasattr(st, "experimental_fragment")
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+# Helper function for individual player CH display (leicht modifizierte Version von get_player_handicaps_single)
+@profiler.timed
+def get_individual_ch_details(course_index, foursome, player_label_prefix, sex_val, hcpi_val, selected_tee_color_val):
+    # Info-CH auf den Vierer-Plätzen des Clubs (foursome = FoursomeDefaults aus clubs.json)
+    results_ind = {"ch_18": None, "ch_9": None, "desc_18": "", "desc_9": ""}
+    if not selected_tee_color_val: return results_ind
+
+    ph = player_handicaps(course_index, sex_val, hcpi_val, selected_tee_color_val, foursome.course_18, foursome.course_9)
+
+    # 18-Loch
+    if ph.tee_18:
+        results_ind["desc_18"] = f"SR {ph.tee_18.SR}, CR {ph.tee_18.CR:.1f}, Par {ph.tee_18.Par}"
+        results_ind["ch_18"] = ph.ch_18
+
+    # 9-Loch
+    if ph.tee_9:
+        results_ind["desc_9"] = f"SR {ph.tee_9.SR}, CR {ph.tee_9.CR:.1f}, Par {ph.tee_9.Par}"
+        results_ind["ch_9"] = ph.ch_9
+        if ph.ch_9_table is not None: results_ind["desc_9"] += f" (Tabelle: {ph.ch_9_table})"
+    return results_ind
+
+
+def display_stroke_allocation(course_index, category, hole_count, default_course, strokes, receiver_name, key_suffix):
+    """Schläge je Loch für den Empfänger als Scorekarten-Zeile; die Verteilung kommt vorberechnet aus dem CourseIndex."""
+    if not course_index.stroke_tables: return # Kursdaten ohne strokeIndex
+    tables = stroke_tables_for(course_index, category, hole_count)
+    if not tables:
+        st.caption(f"Keine Stroke-Indizes für {category}, {hole_count}-Loch in den Kursdaten hinterlegt.")
+        return
+    with st.expander(f"Schläge je Loch für {receiver_name}", expanded=False):
+        names = [t.name for t in tables]
+        table = tables[0]
+        if len(tables) > 1: # z.B. 9-Loch-Schleifen 1-9 und 10-18
+            default_idx = names.index(default_course) if default_course in names else 0
+            table = tables[names.index(st.selectbox("Platz/Schleife:", names, index=default_idx, key=f"stroke_course_{key_suffix}"))]
+        per_hole = stroke_allocation(table, strokes)
+        st.markdown("\n".join([
+            "| Loch | " + " | ".join(str(h) for h in table.holes) + " |",
+            "|---|" + "---|" * len(table.holes),
+            "| HCP | " + " | ".join(str(si) for si in table.stroke_index) + " |",
+            "| Schläge | " + " | ".join(str(n) if n else "" for n in per_hole) + " |",
+        ]))
+
+
+@fragment
+@profiler.profiled("Vierer: Spielerinfo")
+def display_player_info_foursome(player_id_letter, hcpi, course_index, foursome):
+    """Geschlecht, Info-Abschlag und Info-CH eines Vierer-Spielers.
+
+    Als Fragment läuft bei Änderung von Geschlecht oder Abschlag nur diese Karte neu;
+    der HCPI liegt im übergeordneten Tab-Fragment, da er in den Team-HCPI eingeht.
+    """
+    sex = st.radio(f"Geschlecht Spieler {player_id_letter}:", ("Herren", "Damen"), key=f"sex_{player_id_letter}_f7", horizontal=True)
+    
+    # Leer, wenn nicht für beide Kurstypen Daten da sind
+    available_tees = list(common_tees_for(course_index, sex, foursome.course_18, foursome.course_9))
+    
+    selected_tee = None
+    if available_tees:
+        default_player_tee = "gelb" if sex == "Herren" else "rot"
+        player_tee_idx = available_tees.index(default_player_tee) if default_player_tee in available_tees else 0
+        selected_tee = st.selectbox(f"Abschlag Info-CH Spieler {player_id_letter}:", available_tees, index=player_tee_idx, key=f"tee_{player_id_letter}_f7")
+        
+        if selected_tee:
+            ind_data = get_individual_ch_details(course_index, foursome, f"P{player_id_letter}", sex, hcpi, selected_tee)
+            if ind_data["ch_18"] is not None: st.caption(f"Info CH18 ({selected_tee.capitalize()}): {ind_data['ch_18']} ({ind_data['desc_18']})")
+            if ind_data["ch_9"] is not None: st.caption(f"Info CH9 ({selected_tee.capitalize()}): {ind_data['ch_9']} ({ind_data['desc_9']})")
+    else:
+        st.caption(f"Keine passenden Info-Abschläge für Spieler {player_id_letter} ({sex}) gefunden.")
 
 
-# --- Input Validation Ranges ---
-HCPI_MIN, HCPI_MAX = -5.0, 54.0
-SLOPE_MIN, SLOPE_MAX = 55, 155
-CR_MIN, CR_MAX = 55.0, 85.0 
-PAR_MIN, PAR_MAX = 60, 78
+def display_player_input_foursome(player_id_letter, team_name_str, col_to_use, course_index, foursome):
+    with col_to_use:
+        st.markdown(f"**Spieler {player_id_letter} ({team_name_str})**")
+        hcpi = st.number_input(f"HCPI Spieler {player_id_letter}:", min_value=HCPI_MIN, max_value=HCPI_MAX, value=10.0, step=0.1, format="%.1f", key=f"hcpi_{player_id_letter}_f7")
+        display_player_info_foursome(player_id_letter, hcpi, course_index, foursome)
+    return hcpi
+
 
 # --- Tabs ---
-# Nur noch Einzel-Matchplay und Vierer-Matchplay
-tab_single_match, tab_foursome_match = st.tabs([
+# Einzel-Matchplay, Vierer-Matchplay, Turnier-Batch für ganze Auslosungen, Paarungs-Matrix für einen Kader
+# und Aufstellungs-Optimierer für Mannschaftsmatches
+tab_single_match, tab_foursome_match, tab_batch, tab_matrix, tab_lineup = st.tabs([
     "Einzel-Matchplay (FA-02)",
-    "Vierer-Matchplay (FA-03)"
+    "Vierer-Matchplay (FA-03)",
+    "Turnier-Batch",
+    "Paarungs-Matrix",
+    "Aufstellung"
 ])
 
 # --- FA-02: Berechnung der Vorgabe im Einzel-Matchplay ---
 # (Code aus der Antwort vom [Mon Jun 2 17:10:02 2025], leicht angepasst für globale course_data_loaded)
-with tab_single_match:
+@fragment
+@profiler.profiled("Tab Einzel")
+def render_single_match_tab(club, course_index):
     st.header("FA-02: Einzel-Matchplay Vorgabe")
 
-    # course_data_loaded wird jetzt am Anfang der App geladen und hier verwendet
-    # Die Variable club_name wurde bereits oben als club_name_for_title initialisiert
-    st.info(f"Daten für: {club_name_for_title}. Pro Spieler wird Geschlecht und ein Abschlag gewählt. Daraus werden die Vorgaben für 18-Loch und 9-Loch Runden ermittelt.")
+    # club und course_index kommen aus der Clubauswahl oben; ein Clubwechsel startet einen vollen Rerun
+    club_name = course_index.club_name or club.name
+    st.info(f"Daten für: {club_name}. Pro Spieler wird Geschlecht und ein Abschlag gewählt. Daraus werden die Vorgaben für 18-Loch und 9-Loch Runden ermittelt.")
 
-    if not club_data_for_title or "courseHandicaps" not in club_data_for_title:
+    if not course_index.courses:
         st.error("Clubdaten konnten nicht geladen werden. Matchplay-Berechnung mit Clubdaten nicht möglich.")
     else:
         name_col1, name_col2 = st.columns(2)
@@ -68,36 +251,29 @@ with tab_single_match:
 
         player1_results = {"ch_18": None, "ch_9": None}
         player2_results = {"ch_18": None, "ch_9": None}
+        player_courses = {} # Spielername -> (Kategorie, 18-Loch-Platz, 9-Loch-Platz) für die Schlagverteilung
 
         # Helper function to get CH and details for single player (innerhalb des Tabs, um Kapselung zu wahren oder global definieren)
         # Diese Funktion ist die Version aus der Einzel-Matchplay-Anpassung
+        @profiler.timed
         def get_player_handicaps_single(player_label_prefix, sex, hcpi, selected_tee_color):
-            results = {"ch_18": None, "ch_9": None, "desc_18": "", "desc_9": ""}
-            
+            results = {"ch_18": None, "ch_9": None, "desc_18": "", "desc_9": "", "sex": sex,
+                       "course_18": None, "course_9": None}
+            ph = player_handicaps(course_index, sex, hcpi, selected_tee_color)
+            if ph.course_18: results["course_18"] = ph.course_18.holes
+            if ph.course_9: results["course_9"] = ph.course_9.holes
+
             # 18-Loch Logik
-            course_info_18 = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == sex and "18-Loch" in c["holes"]), None)
-            if course_info_18 and selected_tee_color in course_info_18["tees"]:
-                tee_data_18 = course_info_18["tees"][selected_tee_color]
-                results["desc_18"] = f"18-Loch ({course_info_18['holes']}), Abschlag {selected_tee_color.capitalize()}: SR {tee_data_18['SR']}, CR {tee_data_18['CR']:.1f}, Par {tee_data_18['Par']}"
-                ch18 = None
-                if "handicapRanges" in tee_data_18:
-                    for r in tee_data_18["handicapRanges"]:
-                        if r["HCPI_min"] <= hcpi <= r["HCPI_max"]: ch18 = r["CourseHCP"]; break
-                if ch18 is None: ch18 = urs_round(hcpi * (tee_data_18['SR'] / 113) + (tee_data_18['CR'] - tee_data_18['Par']))
-                results["ch_18"] = ch18
+            if ph.tee_18:
+                results["desc_18"] = f"18-Loch ({ph.course_18.holes}), Abschlag {selected_tee_color.capitalize()}: SR {ph.tee_18.SR}, CR {ph.tee_18.CR:.1f}, Par {ph.tee_18.Par}"
+                results["ch_18"] = ph.ch_18
             else: results["desc_18"] = f"Keine 18-Loch Daten für {sex}, Abschlag {selected_tee_color.capitalize()} gefunden."
 
             # 9-Loch Logik
-            course_info_9 = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == sex and "9-Loch" in c["holes"]), None)
-            if course_info_9 and selected_tee_color in course_info_9["tees"]:
-                tee_data_9 = course_info_9["tees"][selected_tee_color]
-                results["desc_9"] = f"9-Loch ({course_info_9['holes']}), Abschlag {selected_tee_color.capitalize()}: SR {tee_data_9['SR']}, CR {tee_data_9['CR']:.1f}, Par {tee_data_9['Par']}"
-                results["ch_9"] = urs_round((hcpi / 2.0) * (tee_data_9['SR'] / 113) + (tee_data_9['CR'] - tee_data_9['Par']))
-                ch9_table = None
-                if "handicapRanges" in tee_data_9:
-                    for r in tee_data_9["handicapRanges"]:
-                        if r["HCPI_min"] <= hcpi <= r["HCPI_max"]: ch9_table = r["CourseHCP"]; break
-                if ch9_table is not None: results["desc_9"] += f" (CH Tabelle: {ch9_table})"
+            if ph.tee_9:
+                results["desc_9"] = f"9-Loch ({ph.course_9.holes}), Abschlag {selected_tee_color.capitalize()}: SR {ph.tee_9.SR}, CR {ph.tee_9.CR:.1f}, Par {ph.tee_9.Par}"
+                results["ch_9"] = ph.ch_9
+                if ph.ch_9_table is not None: results["desc_9"] += f" (CH Tabelle: {ph.ch_9_table})"
             else: results["desc_9"] = f"Keine 9-Loch Daten für {sex}, Abschlag {selected_tee_color.capitalize()} gefunden."
             return results
 
@@ -106,15 +282,7 @@ with tab_single_match:
             st.subheader(player1_name)
             sex_p1 = st.radio(f"Geschlecht {player1_name}:", ("Herren", "Damen"), key="sex_p1_v2_main", horizontal=True) # Key angepasst
             
-            tees_18_p1 = []
-            course_info_18_p1_s = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == sex_p1 and "18-Loch" in c["holes"]), None) # s für single
-            if course_info_18_p1_s: tees_18_p1 = list(course_info_18_p1_s["tees"].keys())
-            
-            tees_9_p1 = []
-            course_info_9_p1_s = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == sex_p1 and "9-Loch" in c["holes"]), None)
-            if course_info_9_p1_s: tees_9_p1 = list(course_info_9_p1_s["tees"].keys())
-            
-            common_tees_p1 = sorted(list(set(tees_18_p1) & set(tees_9_p1)))
+            common_tees_p1 = list(common_tees_for(course_index, sex_p1))
 
             if not common_tees_p1:
                 st.warning(f"Keine gemeinsamen Abschläge für 18- und 9-Loch für {sex_p1} gefunden.")
@@ -129,6 +297,7 @@ with tab_single_match:
                 p1_data = get_player_handicaps_single("p1", sex_p1, hcpi_p1, selected_tee_p1)
                 player1_results["ch_18"] = p1_data["ch_18"]
                 player1_results["ch_9"] = p1_data["ch_9"]
+                player_courses[player1_name] = (sex_p1, p1_data["course_18"], p1_data["course_9"])
                 
                 if p1_data["ch_18"] is not None:
                     st.metric(label="Course HCP 18-Loch", value=p1_data["ch_18"])
@@ -142,15 +311,7 @@ with tab_single_match:
             st.subheader(player2_name)
             sex_p2 = st.radio(f"Geschlecht {player2_name}:", ("Herren", "Damen"), key="sex_p2_v2_main", horizontal=True) # Key angepasst
 
-            tees_18_p2 = []
-            course_info_18_p2_s = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == sex_p2 and "18-Loch" in c["holes"]), None)
-            if course_info_18_p2_s: tees_18_p2 = list(course_info_18_p2_s["tees"].keys())
-            
-            tees_9_p2 = []
-            course_info_9_p2_s = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == sex_p2 and "9-Loch" in c["holes"]), None)
-            if course_info_9_p2_s: tees_9_p2 = list(course_info_9_p2_s["tees"].keys())
-
-            common_tees_p2 = sorted(list(set(tees_18_p2) & set(tees_9_p2)))
+            common_tees_p2 = list(common_tees_for(course_index, sex_p2))
 
             if not common_tees_p2:
                 st.warning(f"Keine gemeinsamen Abschläge für 18- und 9-Loch für {sex_p2} gefunden.")
@@ -165,6 +326,7 @@ with tab_single_match:
                 p2_data = get_player_handicaps_single("p2", sex_p2, hcpi_p2, selected_tee_p2)
                 player2_results["ch_18"] = p2_data["ch_18"]
                 player2_results["ch_9"] = p2_data["ch_9"]
+                player_courses[player2_name] = (sex_p2, p2_data["course_18"], p2_data["course_9"])
 
                 if p2_data["ch_18"] is not None:
                     st.metric(label="Course HCP 18-Loch", value=p2_data["ch_18"])
@@ -178,7 +340,7 @@ with tab_single_match:
         
         def display_matchplay_calculation(ch_p1, ch_p2, p1_name, p2_name, round_type_label): # Definition hier, falls nicht global
             if ch_p1 is not None and ch_p2 is not None:
-                abs_diff = abs(ch_p1 - ch_p2); intermediate_result = abs_diff * (2/3); final_vorgabe = urs_round(intermediate_result)
+                abs_diff, intermediate_result, final_vorgabe, _ = matchplay_allowance(ch_p1, ch_p2)
                 st.markdown(f"**Für eine {round_type_label}-Runde:**")
                 with st.expander("Berechnungsschritte anzeigen"):
                     st.markdown(f"Formel: `|CH {p1_name} - CH {p2_name}| * (2/3)`")
@@ -188,46 +350,45 @@ with tab_single_match:
                 if ch_p1 == ch_p2: st.info("Keine Vorgabeschläge.")
                 elif ch_p1 > ch_p2: st.info(f"{p1_name} (CH {ch_p1}) erhält die Schläge von {p2_name} (CH {ch_p2}).")
                 else: st.info(f"{p2_name} (CH {ch_p2}) erhält die Schläge von {p1_name} (CH {ch_p1}).")
+                if final_vorgabe and ch_p1 != ch_p2:
+                    receiver_name = p1_name if ch_p1 > ch_p2 else p2_name
+                    category, course_18, course_9 = player_courses.get(receiver_name, (None, None, None))
+                    hole_count = 18 if round_type_label == "18-Loch" else 9
+                    display_stroke_allocation(course_index, category, hole_count, course_18 if hole_count == 18 else course_9,
+                                              final_vorgabe, receiver_name, f"single_{hole_count}")
             else: st.markdown(f"**Für {round_type_label}:**"); st.warning(f"CH für {round_type_label} nicht für beide Spieler ermittelt.")
 
         display_matchplay_calculation(player1_results["ch_18"], player2_results["ch_18"], player1_name, player2_name, "18-Loch")
         st.markdown("---")
         display_matchplay_calculation(player1_results["ch_9"], player2_results["ch_9"], player1_name, player2_name, "9-Loch")
 
+with tab_single_match:
+    render_single_match_tab(selected_club, course_index)
+
 # --- FA-03: Berechnung der Vorgabe im Vierer-Matchplay (Foursomes) ---
-with tab_foursome_match:
+@fragment
+@profiler.profiled("Tab Vierer")
+def render_foursome_match_tab(club, course_index):
     st.header("FA-03: Vierer-Matchplay Vorgabe (Foursomes)")
 
-    # club_data_for_title ist global verfügbar (Ergebnis von load_course_data())
-    
-    # FESTGELEGTE STANDARDWERTE FÜR DIE TEAM-CH BERECHNUNG IM VIERER
-    DEFAULT_FOURSOME_MATCH_CATEGORY = "Herren"
-    DEFAULT_FOURSOME_MATCH_TEE_COLOR = "gelb" 
-    DEFAULT_18_HOLE_COURSE_NAME_KEY_F = "18-Loch (Platz 1-18 AB)" 
-    DEFAULT_9_HOLE_COURSE_NAME_KEY_F = "9-Loch (Platz A 1-9)" 
+    # Plätze und Abschlag für die Team-CH kommen aus den Club-Metadaten (clubs.json)
+    foursome = club.foursome
+    club_name = course_index.club_name or club.name
+    st.info(f"Für jeden Spieler können Geschlecht und Abschlag für eine informative Einzel-CH-Anzeige gewählt werden. Die Berechnung der Team-Vorgaben für '{club_name}' basiert fest auf: Kategorie '{foursome.category}', Abschlag '{foursome.tee_color.capitalize()}'.")
 
-    st.info(f"Für jeden Spieler können Geschlecht und Abschlag für eine informative Einzel-CH-Anzeige gewählt werden. Die Berechnung der Team-Vorgaben für '{club_name_for_title}' basiert fest auf: Kategorie '{DEFAULT_FOURSOME_MATCH_CATEGORY}', Abschlag '{DEFAULT_FOURSOME_MATCH_TEE_COLOR.capitalize()}'.")
-
-    if not club_data_for_title or "courseHandicaps" not in club_data_for_title:
+    if not course_index.courses:
         st.error("Clubdaten konnten nicht geladen werden. Vierer-Matchplay-Berechnung nicht möglich.")
     else:
         # Lade die festen Platzdaten für die Team-CH-Berechnung
-        tee_data_18_match_default = None
-        course_info_18_match_f = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == DEFAULT_FOURSOME_MATCH_CATEGORY and c["holes"] == DEFAULT_18_HOLE_COURSE_NAME_KEY_F), None)
-        if course_info_18_match_f and DEFAULT_FOURSOME_MATCH_TEE_COLOR in course_info_18_match_f["tees"]:
-            tee_data_18_match_default = course_info_18_match_f["tees"][DEFAULT_FOURSOME_MATCH_TEE_COLOR]
-
-        tee_data_9_match_default = None
-        course_info_9_match_f = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == DEFAULT_FOURSOME_MATCH_CATEGORY and c["holes"] == DEFAULT_9_HOLE_COURSE_NAME_KEY_F), None)
-        if course_info_9_match_f and DEFAULT_FOURSOME_MATCH_TEE_COLOR in course_info_9_match_f["tees"]:
-            tee_data_9_match_default = course_info_9_match_f["tees"][DEFAULT_FOURSOME_MATCH_TEE_COLOR]
+        tee_data_18_match_default = find_tee(course_index, foursome.category, foursome.tee_color, holes_name=foursome.course_18)
+        tee_data_9_match_default = find_tee(course_index, foursome.category, foursome.tee_color, holes_name=foursome.course_9)
 
         if not tee_data_18_match_default or not tee_data_9_match_default:
-            st.error(f"Fehler: Die Standard-Platzdaten für Vierer ({DEFAULT_FOURSOME_MATCH_CATEGORY}, {DEFAULT_FOURSOME_MATCH_TEE_COLOR.capitalize()}) für 18 & 9 Loch konnten nicht in course_data.json gefunden werden.")
+            st.error(f"Fehler: Die Standard-Platzdaten für Vierer ({foursome.category}, {foursome.tee_color.capitalize()}) für 18 & 9 Loch konnten nicht in {os.path.basename(club.path)} gefunden werden.")
         else:
             with st.expander("Details zu den Standard-Platzdaten für Team-Berechnung (Vierer)", expanded=False):
-                st.markdown(f"**18-Loch:** SR {tee_data_18_match_default['SR']}, CR {tee_data_18_match_default['CR']:.1f}, Par {tee_data_18_match_default['Par']}")
-                st.markdown(f"**9-Loch:** SR {tee_data_9_match_default['SR']}, CR {tee_data_9_match_default['CR']:.1f}, Par {tee_data_9_match_default['Par']}")
+                st.markdown(f"**18-Loch:** SR {tee_data_18_match_default.SR}, CR {tee_data_18_match_default.CR:.1f}, Par {tee_data_18_match_default.Par}")
+                st.markdown(f"**9-Loch:** SR {tee_data_9_match_default.SR}, CR {tee_data_9_match_default.CR:.1f}, Par {tee_data_9_match_default.Par}")
             
             st.markdown("---")
             # --- Teamnamen und Spielereingaben ---
@@ -238,74 +399,17 @@ with tab_foursome_match:
 
             player_inputs_f = {} # Store HCPIs for Team HCPI calculation
 
-            # Helper function for individual player CH display (leicht modifizierte Version von get_player_handicaps_single)
-            def get_individual_ch_details(player_label_prefix, sex_val, hcpi_val, selected_tee_color_val):
-                # Diese Funktion sollte global oder hier zugreifbar sein, und club_data_for_title verwenden
-                results_ind = {"ch_18": None, "ch_9": None, "desc_18": "", "desc_9": ""}
-                if not selected_tee_color_val: return results_ind
-
-                # 18-Loch
-                ci_18_ind = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == sex_val and DEFAULT_18_HOLE_COURSE_NAME_KEY_F in c["holes"]), None)
-                if ci_18_ind and selected_tee_color_val in ci_18_ind["tees"]:
-                    td_18_ind = ci_18_ind["tees"][selected_tee_color_val]
-                    results_ind["desc_18"] = f"SR {td_18_ind['SR']}, CR {td_18_ind['CR']:.1f}, Par {td_18_ind['Par']}"
-                    ch18_ind = None
-                    if "handicapRanges" in td_18_ind:
-                        for r_ind in td_18_ind["handicapRanges"]:
-                            if r_ind["HCPI_min"] <= hcpi_val <= r_ind["HCPI_max"]: ch18_ind = r_ind["CourseHCP"]; break
-                    if ch18_ind is None: ch18_ind = urs_round(hcpi_val * (td_18_ind['SR'] / 113) + (td_18_ind['CR'] - td_18_ind['Par']))
-                    results_ind["ch_18"] = ch18_ind
-                
-                # 9-Loch
-                ci_9_ind = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == sex_val and DEFAULT_9_HOLE_COURSE_NAME_KEY_F in c["holes"]), None)
-                if ci_9_ind and selected_tee_color_val in ci_9_ind["tees"]:
-                    td_9_ind = ci_9_ind["tees"][selected_tee_color_val]
-                    results_ind["desc_9"] = f"SR {td_9_ind['SR']}, CR {td_9_ind['CR']:.1f}, Par {td_9_ind['Par']}"
-                    results_ind["ch_9"] = urs_round((hcpi_val / 2.0) * (td_9_ind['SR'] / 113) + (td_9_ind['CR'] - td_9_ind['Par']))
-                    ch9_table_ind = None
-                    if "handicapRanges" in td_9_ind:
-                        for r_ind in td_9_ind["handicapRanges"]:
-                            if r_ind["HCPI_min"] <= hcpi_val <= r_ind["HCPI_max"]: ch9_table_ind = r_ind["CourseHCP"]; break
-                    if ch9_table_ind is not None: results_ind["desc_9"] += f" (Tabelle: {ch9_table_ind})"
-                return results_ind
-
-            def display_player_input_foursome(player_id_letter, team_name_str, col_to_use):
-                with col_to_use:
-                    st.markdown(f"**Spieler {player_id_letter} ({team_name_str})**")
-                    hcpi = st.number_input(f"HCPI Spieler {player_id_letter}:", min_value=HCPI_MIN, max_value=HCPI_MAX, value=10.0, step=0.1, format="%.1f", key=f"hcpi_{player_id_letter}_f7")
-                    sex = st.radio(f"Geschlecht Spieler {player_id_letter}:", ("Herren", "Damen"), key=f"sex_{player_id_letter}_f7", horizontal=True)
-                    
-                    available_tees = []
-                    ci18 = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == sex and DEFAULT_18_HOLE_COURSE_NAME_KEY_F in c["holes"]), None)
-                    ci9 = next((c for c in club_data_for_title["courseHandicaps"] if c["category"] == sex and DEFAULT_9_HOLE_COURSE_NAME_KEY_F in c["holes"]), None)
-                    if ci18 and ci9: # Nur wenn für beide Kurstypen Daten da sind
-                        available_tees = sorted(list(set(ci18["tees"].keys()) & set(ci9["tees"].keys())))
-                    
-                    selected_tee = None
-                    if available_tees:
-                        default_player_tee = "gelb" if sex == "Herren" else "rot"
-                        player_tee_idx = available_tees.index(default_player_tee) if default_player_tee in available_tees else 0
-                        selected_tee = st.selectbox(f"Abschlag Info-CH Spieler {player_id_letter}:", available_tees, index=player_tee_idx, key=f"tee_{player_id_letter}_f7")
-                        
-                        if selected_tee:
-                            ind_data = get_individual_ch_details(f"P{player_id_letter}", sex, hcpi, selected_tee)
-                            if ind_data["ch_18"] is not None: st.caption(f"Info CH18 ({selected_tee.capitalize()}): {ind_data['ch_18']} ({ind_data['desc_18']})")
-                            if ind_data["ch_9"] is not None: st.caption(f"Info CH9 ({selected_tee.capitalize()}): {ind_data['ch_9']} ({ind_data['desc_9']})")
-                    else:
-                        st.caption(f"Keine passenden Info-Abschläge für Spieler {player_id_letter} ({sex}) gefunden.")
-                return hcpi
-
             # Spieler Eingaben sammeln
             p_cols = st.columns(4)
-            player_inputs_f["A"] = display_player_input_foursome("A", team1_name, p_cols[0])
-            player_inputs_f["B"] = display_player_input_foursome("B", team1_name, p_cols[1])
-            player_inputs_f["C"] = display_player_input_foursome("C", team2_name, p_cols[2])
-            player_inputs_f["D"] = display_player_input_foursome("D", team2_name, p_cols[3])
+            player_inputs_f["A"] = display_player_input_foursome("A", team1_name, p_cols[0], course_index, foursome)
+            player_inputs_f["B"] = display_player_input_foursome("B", team1_name, p_cols[1], course_index, foursome)
+            player_inputs_f["C"] = display_player_input_foursome("C", team2_name, p_cols[2], course_index, foursome)
+            player_inputs_f["D"] = display_player_input_foursome("D", team2_name, p_cols[3], course_index, foursome)
             st.markdown("---")
 
             # Team HCPIs
-            team_hcpi_t1 = (min(player_inputs_f["A"], player_inputs_f["B"]) * 0.6) + (max(player_inputs_f["A"], player_inputs_f["B"]) * 0.4)
-            team_hcpi_t2 = (min(player_inputs_f["C"], player_inputs_f["D"]) * 0.6) + (max(player_inputs_f["C"], player_inputs_f["D"]) * 0.4)
+            team_hcpi_t1 = team_hcpi(player_inputs_f["A"], player_inputs_f["B"])
+            team_hcpi_t2 = team_hcpi(player_inputs_f["C"], player_inputs_f["D"])
             st.subheader("Team Handicap Indizes (Team-HCPI)")
             thcp_col1, thcp_col2 = st.columns(2)
             thcp_col1.metric(label=f"Team-HCPI {team1_name}", value=f"{team_hcpi_t1:.2f}")
@@ -313,48 +417,26 @@ with tab_foursome_match:
             st.markdown("---")
 
             # Team Course Handicaps (mit Standard-Platzdaten)
-            team_ch_t1_18, team_ch_t1_9 = None, None
-            team_ch_t2_18, team_ch_t2_9 = None, None
-            
-            # Team 1
-            ch18_t1 = None
-            if "handicapRanges" in tee_data_18_match_default:
-                for r in tee_data_18_match_default["handicapRanges"]:
-                    if r["HCPI_min"] <= team_hcpi_t1 <= r["HCPI_max"]: ch18_t1 = r["CourseHCP"]; break
-            if ch18_t1 is None: ch18_t1 = urs_round(team_hcpi_t1 * (tee_data_18_match_default['SR'] / 113) + (tee_data_18_match_default['CR'] - tee_data_18_match_default['Par']))
-            team_ch_t1_18 = ch18_t1
-            team_ch_t1_9 = urs_round((team_hcpi_t1 / 2.0) * (tee_data_9_match_default['SR'] / 113) + (tee_data_9_match_default['CR'] - tee_data_9_match_default['Par']))
-            
-            # Team 2
-            ch18_t2 = None
-            if "handicapRanges" in tee_data_18_match_default:
-                for r in tee_data_18_match_default["handicapRanges"]:
-                    if r["HCPI_min"] <= team_hcpi_t2 <= r["HCPI_max"]: ch18_t2 = r["CourseHCP"]; break
-            if ch18_t2 is None: ch18_t2 = urs_round(team_hcpi_t2 * (tee_data_18_match_default['SR'] / 113) + (tee_data_18_match_default['CR'] - tee_data_18_match_default['Par']))
-            team_ch_t2_18 = ch18_t2
-            team_ch_t2_9 = urs_round((team_hcpi_t2 / 2.0) * (tee_data_9_match_default['SR'] / 113) + (tee_data_9_match_default['CR'] - tee_data_9_match_default['Par']))
+            team_ch_t1_18 = course_handicap_18(tee_data_18_match_default, team_hcpi_t1)
+            team_ch_t1_9 = course_handicap_9(tee_data_9_match_default, team_hcpi_t1)
+            team_ch_t2_18 = course_handicap_18(tee_data_18_match_default, team_hcpi_t2)
+            team_ch_t2_9 = course_handicap_9(tee_data_9_match_default, team_hcpi_t2)
 
             st.subheader("Team Course Handicaps (Team-CH)")
-            st.caption(f"Berechnet basierend auf Standard-Platzdaten: {DEFAULT_FOURSOME_MATCH_CATEGORY}, Abschlag {DEFAULT_FOURSOME_MATCH_TEE_COLOR.capitalize()}")
+            st.caption(f"Berechnet basierend auf Standard-Platzdaten: {foursome.category}, Abschlag {foursome.tee_color.capitalize()}")
             tch_col1, tch_col2 = st.columns(2)
             with tch_col1:
                 st.markdown(f"**{team1_name}**")
                 st.metric("Team-CH 18-Loch", value=f"{team_ch_t1_18}")
                 st.metric("Team-CH 9-Loch (Formel)", value=f"{team_ch_t1_9}")
                 # Informativer 9-Loch Tabellenwert für Team 1
-                ch9_t1_table_info = None
-                if "handicapRanges" in tee_data_9_match_default:
-                    for r_info in tee_data_9_match_default["handicapRanges"]:
-                        if r_info["HCPI_min"] <= team_hcpi_t1 <= r_info["HCPI_max"]: ch9_t1_table_info = r_info["CourseHCP"]; break
+                ch9_t1_table_info = table_course_handicap(tee_data_9_match_default, team_hcpi_t1)
                 if ch9_t1_table_info is not None: st.caption(f"9-Loch CH (Tabelle): {ch9_t1_table_info}")
             with tch_col2:
                 st.markdown(f"**{team2_name}**")
                 st.metric("Team-CH 18-Loch", value=f"{team_ch_t2_18}")
                 st.metric("Team-CH 9-Loch (Formel)", value=f"{team_ch_t2_9}")
-                ch9_t2_table_info = None
-                if "handicapRanges" in tee_data_9_match_default:
-                    for r_info in tee_data_9_match_default["handicapRanges"]:
-                        if r_info["HCPI_min"] <= team_hcpi_t2 <= r_info["HCPI_max"]: ch9_t2_table_info = r_info["CourseHCP"]; break
+                ch9_t2_table_info = table_course_handicap(tee_data_9_match_default, team_hcpi_t2)
                 if ch9_t2_table_info is not None: st.caption(f"9-Loch CH (Tabelle): {ch9_t2_table_info}")
 
             st.markdown("---")
@@ -362,7 +444,7 @@ with tab_foursome_match:
             
             def display_foursome_allowance(tch1, tch2, team1_n, team2_n, round_label):
                 if tch1 is not None and tch2 is not None:
-                    abs_diff = abs(tch1 - tch2); final_vorgabe = urs_round(abs_diff)
+                    abs_diff, _, final_vorgabe, _ = foursome_allowance(tch1, tch2)
                     st.markdown(f"**Für eine {round_label}-Runde:**")
                     with st.expander("Berechnungsschritte anzeigen"):
                         st.markdown(f"Formel: `Runde( |Team CH {team1_n} - Team CH {team2_n}| )`")
@@ -371,11 +453,289 @@ with tab_foursome_match:
                     if tch1 == tch2: st.info("Keine Vorgabeschläge.")
                     elif tch1 > tch2: st.info(f"{team1_n} (Team CH {tch1}) erhält die Schläge von {team2_n} (Team CH {tch2}).")
                     else: st.info(f"{team2_n} (Team CH {tch2}) erhält die Schläge von {team1_n} (Team CH {tch1}).")
+                    if final_vorgabe and tch1 != tch2:
+                        hole_count = 18 if round_label == "18-Loch" else 9
+                        display_stroke_allocation(course_index, foursome.category, hole_count,
+                                                  foursome.course_18 if hole_count == 18 else foursome.course_9,
+                                                  final_vorgabe, team1_n if tch1 > tch2 else team2_n, f"foursome_{hole_count}")
                 else: st.markdown(f"**Für {round_label}:**"); st.warning(f"Team CH für {round_label} nicht für beide Teams ermittelt.")
             
             display_foursome_allowance(team_ch_t1_18, team_ch_t2_18, team1_name, team2_name, "18-Loch")
             st.markdown("---")
             display_foursome_allowance(team_ch_t1_9, team_ch_t2_9, team1_name, team2_name, "9-Loch")
 
+with tab_foursome_match:
+    render_foursome_match_tab(selected_club, course_index)
+
+# --- Turnier-Batch: Vorgaben für eine komplette Auslosung ---
+@fragment
+@profiler.profiled("Tab Batch")
+def render_batch_tab(club, course_index):
+    st.header("Turnier-Batch: Vorgaben für eine ganze Auslosung")
+    st.info("Laden Sie die Auslosung als CSV (Trennzeichen , oder ;) oder Excel hoch. Für jede Paarung werden CH18, CH9 und die Vorgabeschläge berechnet; das Ergebnis kann als CSV heruntergeladen werden.")
+
+    if not course_index.courses:
+        st.error("Clubdaten konnten nicht geladen werden. Batch-Berechnung nicht möglich.")
+    else:
+        batch_mode = st.radio("Spielform:", ("Einzel-Matchplay (FA-02)", "Vierer-Matchplay (FA-03)"), key="batch_mode", horizontal=True)
+        is_foursome_batch = batch_mode.startswith("Vierer")
+        if is_foursome_batch:
+            st.caption("Erwartete Spalten: team_1, hcpi_a, hcpi_b, team_2, hcpi_c, hcpi_d. Team-CH auf Basis der Standard-Platzdaten "
+                       f"({club.foursome.category}, Abschlag {club.foursome.tee_color.capitalize()}).")
+        else:
+            st.caption("Erwartete Spalten: name_1, geschlecht_1, abschlag_1, hcpi_1, name_2, geschlecht_2, abschlag_2, hcpi_2.")
+
+        draw_file = st.file_uploader("Auslosung (CSV oder Excel):", type=["csv", "txt", "xlsx", "xls"], key="batch_file")
+        if draw_file is not None:
+            import pandas as pd # erst hier, damit der Kaltstart der Matchplay-Tabs pandas nicht laden muss
+            from tournament_batch import process_draw
+            try:
+                batch_result = pd.concat(process_draw(
+                    draw_file.getvalue(), course_index,
+                    mode="vierer" if is_foursome_batch else "einzel",
+                    filename=draw_file.name,
+                    foursome_defaults=club.foursome,
+                ), ignore_index=True)
+            except ValueError as e:
+                st.error(f"Auslosung konnte nicht verarbeitet werden: {e}")
+            except ImportError:
+                st.error("Für Excel-Dateien wird openpyxl benötigt. Bitte die Auslosung als CSV hochladen.")
+            else:
+                missing = batch_result["vorgabe_18"].isna().sum()
+                st.success(f"{len(batch_result)} Paarungen berechnet.")
+                if missing: st.warning(f"{missing} Paarungen ohne 18-Loch-Vorgabe (unbekannter Abschlag/Geschlecht oder HCPI außerhalb {HCPI_MIN}..{HCPI_MAX}).")
+                st.dataframe(batch_result, use_container_width=True)
+                st.download_button("Ergebnis als CSV herunterladen", batch_result.to_csv(index=False).encode("utf-8"),
+                                   file_name="vorgaben_auslosung.csv", mime="text/csv", key="batch_download")
+
+with tab_batch:
+    render_batch_tab(selected_club, course_index)
+
+# --- Paarungs-Matrix: Vorgaben aller möglichen Paarungen eines Kaders ---
+data_editor = getattr(st, "data_editor", None) or getattr(st, "experimental_data_editor", None)
+# Schalter für Tabs mit Kader-Berechnung: erst eingeschaltet werden pandas importiert und die Matrizen gerechnet,
+# sonst liefe das bei jedem vollen Rerun (Kaltstart, ohne Fragmente jede Eingabe) mit
+toggle = getattr(st, "toggle", None) or st.checkbox
+DEFAULT_ROSTER = {"name": ["Spieler 1", "Spieler 2", "Spieler 3", "Spieler 4"], "geschlecht": ["Herren", "Herren", "Damen", "Herren"],
+                  "abschlag": ["gelb", "gelb", "rot", "weiss"], "hcpi": [4.2, 12.5, 18.0, 26.3]}
+
+
+def roster_input(key_prefix, default_roster, label="Kader"):
+    """Kader aus CSV/Excel-Upload oder Standardkader, im Tabellen-Editor bearbeitbar; None bei Lesefehler (Meldung wird angezeigt)."""
+    import pandas as pd # erst hier, damit der Kaltstart der Matchplay-Tabs pandas nicht laden muss
+    from tournament_batch import read_roster
+    roster_file = st.file_uploader(f"{label} (CSV oder Excel, Spalten name, geschlecht, abschlag, hcpi):", type=["csv", "txt", "xlsx", "xls"], key=f"{key_prefix}_file")
+    try:
+        roster = read_roster(roster_file.getvalue(), roster_file.name) if roster_file is not None else pd.DataFrame(default_roster)
+    except ValueError as e:
+        st.error(f"{label} konnte nicht gelesen werden: {e}")
+        return None
+    except ImportError:
+        st.error(f"Für Excel-Dateien wird openpyxl benötigt. Bitte den {label} als CSV hochladen.")
+        return None
+    if data_editor is not None:
+        roster = data_editor(roster, num_rows="dynamic", use_container_width=True, key=f"{key_prefix}_roster_{roster_file.name if roster_file else ''}")
+    return roster.dropna(how="all")
+
+
+def _heatmap(matrix):
+    """Matrix eingefärbt: blau = Zeile erhält Schläge, rot = Zeile gibt Schläge. Ohne jinja2 (Styler) als einfache Tabelle."""
+    import pandas as pd
+    def cell_color(value):
+        if pd.isna(value) or value == 0: return ""
+        alpha = 0.15 + 0.6 * min(abs(value) / 18, 1)
+        return f"background-color: rgba({'0,104,201' if value > 0 else '255,75,75'},{alpha:.2f})"
+    try:
+        styler = matrix.style
+        return (getattr(styler, "map", None) or styler.applymap)(cell_color)
+    except ImportError:
+        return matrix
+
+
+@fragment
+@profiler.profiled("Tab Matrix")
+def render_matrix_tab(club, course_index):
+    st.header("Paarungs-Matrix: alle Paarungen eines Kaders")
+    st.info("Für einen Kader werden die Vorgabeschläge aller möglichen Einzel-Paarungen (FA-02) und aller Vierer-Partnerschaften "
+            "(FA-03, Team-HCPI 60/40) auf einmal berechnet. Positive Werte: der Spieler/die Partnerschaft der Zeile erhält Schläge, "
+            "negative Werte: gibt Schläge.")
+
+    if not course_index.courses:
+        st.error("Clubdaten konnten nicht geladen werden. Paarungs-Matrix nicht möglich.")
+        return
+    if not toggle("Paarungs-Matrix berechnen", key="matrix_active"):
+        return
+    from tournament_batch import (
+        partnership_allowance_matrices, partnerships, roster_course_handicaps, singles_allowance_matrices,
+    )
+
+    roster = roster_input("matrix", DEFAULT_ROSTER)
+    if roster is None:
+        return
+    roster = roster.dropna(how="all")
+    if len(roster) < 2:
+        st.warning("Für eine Paarungs-Matrix werden mindestens zwei Spieler benötigt.")
+        return
+    try:
+        roster_ch = roster_course_handicaps(roster, course_index)
+        singles = singles_allowance_matrices(roster_ch)
+        partners = partnerships(roster_ch, course_index, *club.foursome)
+    except ValueError as e:
+        st.error(f"Paarungs-Matrix konnte nicht berechnet werden: {e}")
+        return
+    missing = roster_ch["ch18"].isna().sum()
+    if missing: st.warning(f"{missing} Spieler ohne 18-Loch-CH (unbekannter Abschlag/Geschlecht oder HCPI außerhalb {HCPI_MIN}..{HCPI_MAX}).")
+
+    holes = "18" if st.radio("Runde:", ("18-Loch", "9-Loch"), key="matrix_holes", horizontal=True) == "18-Loch" else "9"
+    st.subheader(f"Einzel-Matchplay {holes}-Loch: |CH₁ - CH₂| * 2/3")
+    st.dataframe(_heatmap(singles[holes]), use_container_width=True)
+    st.download_button(f"Einzel-Matrix {holes}-Loch als CSV herunterladen", singles[holes].to_csv().encode("utf-8"),
+                       file_name=f"einzel_matrix_{holes}.csv", mime="text/csv", key="matrix_download_singles")
+
+    st.subheader(f"Vierer-Partnerschaften {holes}-Loch")
+    st.caption(f"{len(partners)} Partnerschaften, Team-CH auf Basis der Standard-Platzdaten ({club.foursome.category}, Abschlag {club.foursome.tee_color.capitalize()}).")
+    st.dataframe(partners.set_index("partnerschaft")[["team_hcpi", f"team_ch{holes}"]].sort_values(f"team_ch{holes}"), use_container_width=True)
+    st.download_button("Partnerschaften als CSV herunterladen", partners.drop(columns=["nr_1", "nr_2"]).to_csv(index=False).encode("utf-8"),
+                       file_name="partnerschaften.csv", mime="text/csv", key="matrix_download_partners")
+
+    foursome_matrix = partnership_allowance_matrices(partners)[holes]
+    with st.expander(f"Vierer-Matrix {holes}-Loch: |Team-CH₁ - Team-CH₂| ({len(partners)}×{len(partners)})", expanded=len(partners) <= 15):
+        st.dataframe(_heatmap(foursome_matrix), use_container_width=True)
+        st.download_button(f"Vierer-Matrix {holes}-Loch als CSV herunterladen", foursome_matrix.to_csv().encode("utf-8"),
+                           file_name=f"vierer_matrix_{holes}.csv", mime="text/csv", key="matrix_download_foursomes")
+
+with tab_matrix:
+    render_matrix_tab(selected_club, course_index)
+
+
+# --- Aufstellungs-Optimierer: Paarungen für ein Mannschaftsmatch ---
+# Die Suche läuft in einem Hintergrund-Thread (lineup_optimizer.submit); nur solange sie läuft, fragt
+# ein Status-Fragment alle LINEUP_POLL_SECONDS nach dem Ergebnis, die Eingaben bleiben währenddessen bedienbar.
+LINEUP_POLL_SECONDS = 1.0
+DEFAULT_LINEUP_ROSTERS = (
+    {"name": ["Anna", "Ben", "Clara", "David"], "geschlecht": ["Damen", "Herren", "Damen", "Herren"],
+     "abschlag": ["rot", "gelb", "rot", "gelb"], "hcpi": [8.4, 14.1, 22.7, 31.0]},
+    {"name": ["Emil", "Frida", "Georg", "Hanna"], "geschlecht": ["Herren", "Damen", "Herren", "Damen"],
+     "abschlag": ["gelb", "rot", "gelb", "rot"], "hcpi": [5.9, 16.3, 19.8, 36.2]},
+)
+
+
+def _polling_fragment(func):
+    """Fragment, das sich selbst alle LINEUP_POLL_SECONDS neu ausführt; ohne run_every-Unterstützung mit Aktualisieren-Knopf."""
+    decorator = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if decorator is not None:
+        try:
+            return decorator(run_every=LINEUP_POLL_SECONDS)(func)
+        except TypeError:
+            pass
+    def without_polling(*args, **kwargs):
+        func(*args, **kwargs)
+        st.button("Status aktualisieren", key="lineup_refresh") # der Klick löst den Rerun aus
+    return without_polling
+
+
+@fragment
+@profiler.profiled("Tab Aufstellung")
+def render_lineup_tab(club, course_index):
+    st.header("Aufstellung: Paarungen für ein Mannschaftsmatch")
+    st.info("Aus zwei Kadern werden die Einzel-Paarungen (FA-02) bzw. Vierer-Partnerschaften (FA-03) gesucht, bei denen insgesamt "
+            "am wenigsten Vorgabeschläge gegeben werden oder die Schläge zwischen den Mannschaften am ausgeglichensten sind.")
+
+    if not course_index.courses:
+        st.error("Clubdaten konnten nicht geladen werden. Aufstellung nicht möglich.")
+        return
+    if not toggle("Aufstellung planen", key="lineup_active"):
+        return
+    from tournament_batch import roster_course_handicaps
+    from lineup_optimizer import DEFAULT_TIME_BUDGET, optimize_foursomes, optimize_singles, submit
+
+    rosters = []
+    for n, column in enumerate(st.columns(2), start=1):
+        with column:
+            st.markdown(f"**Mannschaft {n}**")
+            rosters.append(roster_input(f"lineup_{n}", DEFAULT_LINEUP_ROSTERS[n - 1], label=f"Kader Mannschaft {n}"))
+    if any(roster is None for roster in rosters):
+        return
+
+    opt_col1, opt_col2, opt_col3, opt_col4 = st.columns(4)
+    is_foursome = opt_col1.radio("Spielform:", ("Einzel (FA-02)", "Vierer (FA-03)"), key="lineup_mode").startswith("Vierer")
+    holes = "18" if opt_col2.radio("Runde:", ("18-Loch", "9-Loch"), key="lineup_holes") == "18-Loch" else "9"
+    objective = "minimal" if opt_col3.radio("Ziel:", ("Wenigste Vorgabeschläge", "Ausgeglichen"), key="lineup_objective").startswith("Wenigste") else "ausgeglichen"
+    time_budget = opt_col4.slider("Zeitbudget (s):", 1.0, 30.0, DEFAULT_TIME_BUDGET, 1.0, key="lineup_budget")
+    if is_foursome:
+        st.caption(f"Team-CH auf Basis der Standard-Platzdaten ({club.foursome.category}, Abschlag {club.foursome.tee_color.capitalize()}).")
+
+    if st.button("Aufstellung berechnen", key="lineup_start"):
+        try:
+            roster_ch_1, roster_ch_2 = (roster_course_handicaps(roster, course_index) for roster in rosters)
+        except ValueError as e:
+            st.error(f"Kader konnte nicht verarbeitet werden: {e}")
+            return
+        previous = st.session_state.get("lineup_job")
+        if previous is not None: previous["cancel"].set() # laufende Suche dieser Session abbrechen
+        cancel = threading.Event()
+        if is_foursome:
+            future = submit(optimize_foursomes, roster_ch_1, roster_ch_2, course_index, club.foursome, holes, objective, time_budget, cancel)
+        else:
+            future = submit(optimize_singles, roster_ch_1, roster_ch_2, holes, objective, time_budget, cancel)
+        st.session_state["lineup_job"] = {"future": future, "cancel": cancel, "mode": "Vierer" if is_foursome else "Einzel", "holes": holes}
+        # Der Klick hat nur dieses Fragment neu ausgeführt; Fortschritt und Ergebnis stehen außerhalb und brauchen einen
+        # vollen Rerun (st.rerun im Fragment wirkt auf die ganze App). Ohne Fragmente läuft das Skript ohnehin komplett.
+        if FRAGMENTS_SUPPORTED: st.rerun()
+
+
+@_polling_fragment
+def render_lineup_progress(job):
+    """Status einer laufenden Suche; ist sie fertig, zeigt ein voller Rerun das Ergebnis und beendet das Polling."""
+    if job["future"].done():
+        st.rerun()
+    st.info("Aufstellung wird berechnet …")
+    if st.button("Abbrechen", key="lineup_cancel"): job["cancel"].set()
+
+
+def render_lineup_result():
+    job = st.session_state.get("lineup_job")
+    if job is None:
+        return
+    future = job["future"]
+    if not future.done():
+        render_lineup_progress(job) # das Polling-Fragment gibt es nur, solange gerechnet wird
+        return
+    try:
+        result = future.result()
+    except ValueError as e:
+        st.error(f"Aufstellung konnte nicht berechnet werden: {e}")
+        return
+    if not result.matches:
+        st.warning("Keine Aufstellung gefunden (zu wenige Spieler mit ermitteltem CH oder Zeitbudget zu knapp).")
+        return
+
+    import pandas as pd
+    side = "Partnerschaft" if job["mode"] == "Vierer" else "Spieler"
+    lineup = pd.DataFrame([{f"{side} Mannschaft 1": m.team_1, "CH 1": m.ch_1, f"{side} Mannschaft 2": m.team_2, "CH 2": m.ch_2,
+                            "Vorgabeschläge": m.strokes, "erhält": {1: m.team_1, 2: m.team_2}.get(m.receiver, "-")} for m in result.matches])
+    st.subheader(f"Aufstellung {job['mode']} {job['holes']}-Loch")
+    st.dataframe(lineup, use_container_width=True)
+    res_col1, res_col2 = st.columns(2)
+    res_col1.metric("Vorgabeschläge gesamt", result.total_strokes)
+    res_col2.metric("Netto erhaltene Schläge Mannschaft 1", result.net_strokes)
+    if result.optimal:
+        st.success(f"Optimale Aufstellung (berechnet in {result.seconds:.2f} s).")
+    else:
+        st.warning(f"Zeitbudget aufgebraucht oder abgebrochen: beste gefundene Aufstellung nach {result.evaluated} Suchschritten ({result.seconds:.1f} s), nicht garantiert optimal.")
+    st.download_button("Aufstellung als CSV herunterladen", lineup.to_csv(index=False).encode("utf-8"),
+                       file_name="aufstellung.csv", mime="text/csv", key="lineup_download")
+
+with tab_lineup:
+    render_lineup_tab(selected_club, course_index)
+    with profiler.section("Aufstellung: Ergebnis"): # nur im vollen Rerun; die sekündlichen Abfragen einer laufenden Suche würden das Profil fluten
+        render_lineup_result()
+
 st.markdown("---")
-st.caption("Diese App ist eine reine Offline-Anwendung (PWA) und speichert keine Daten.")
\ No newline at end of file
+st.caption("Diese App ist eine reine Offline-Anwendung (PWA) und speichert keine Daten.")
+with st.expander("Cache-Statistik (Clubdaten)", expanded=False):
+    st.caption(f"Geladene Clubs: {len(club_registry.loaded_club_ids())}/{club_registry.maxsize} "
+               f"(von {len(club_registry.clubs)}), Treffer: {club_registry.hits}, Ladevorgänge: {club_registry.loads}")
+
+if debug_mode:
+    render_profile_sidebar(profiler, profiler.end())
@@ -0,0 +1,234 @@
+"""Turnier-Batch: Vorgaben für eine komplette Auslosung aus CSV/Excel in einem Durchlauf.
+
+Die Auslosung wird in Blöcken (chunks) gelesen und blockweise vektorisiert verarbeitet,
+so dass auch Auslosungen mit 10.000+ Zeilen nicht Zeile für Zeile durch Python laufen.
+Die Berechnung entspricht FA-02 (get_player_handicaps_single / display_matchplay_calculation)
+bzw. FA-03 (Team-HCPI 60/40 und display_foursome_allowance) in streamlit_app.py.
+"""
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from handicap_engine import HCPI_MAX, HCPI_MIN, course_handicaps_18_many, course_handicaps_9_many, find_tee, team_hcpis_many
+
+# Erwartete Spalten je Modus (Groß-/Kleinschreibung und Leerzeichen in der Kopfzeile werden ignoriert)
+SINGLES_COLUMNS = ("name_1", "geschlecht_1", "abschlag_1", "hcpi_1", "name_2", "geschlecht_2", "abschlag_2", "hcpi_2")
+FOURSOME_COLUMNS = ("team_1", "hcpi_a", "hcpi_b", "team_2", "hcpi_c", "hcpi_d")
+
+DEFAULT_CHUNKSIZE = 5000
+
+
+def _normalize_columns(df):
+    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    return df
+
+
+def _check_columns(df, required):
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise ValueError(f"Fehlende Spalten in der Auslosung: {', '.join(missing)}")
+
+
+def _hcpi_series(values):
+    """HCPI-Spalte als float; Komma als Dezimaltrenner und Werte außerhalb HCPI_MIN..HCPI_MAX werden zu NaN.
+
+    Plus-Handicaps in der üblichen Schreibweise ("+2,3") werden zu negativen HCPIs (-2.3), ein Vorzeichen
+    dahinter ("+-2,3") ist ungültig.
+    """
+    text = values.astype(str).str.strip().str.replace(",", ".", regex=False)
+    plus = text.str.startswith("+")
+    hcpi = pd.to_numeric(text.str.removeprefix("+").where(~plus | ~text.str[1:2].isin(["+", "-"])), errors="coerce")
+    hcpi = hcpi.where(~plus, -hcpi)
+    return hcpi.where(hcpi.between(HCPI_MIN, HCPI_MAX))
+
+
+def _player_course_handicaps(index, sex, tee, hcpi, holes_18=None, holes_9=None):
+    """CH18/CH9 für eine Spalte von Spielern; gruppiert nach (Geschlecht, Abschlag), je Gruppe ein vektorisierter Aufruf."""
+    ch18 = pd.Series(pd.NA, index=hcpi.index, dtype="Int64")
+    ch9 = pd.Series(pd.NA, index=hcpi.index, dtype="Int64")
+    valid = hcpi.notna()
+    if not valid.any():
+        return ch18, ch9
+    sex = sex.astype(str).str.strip()
+    tee = tee.astype(str).str.strip().str.lower()
+    for (category, tee_color), rows in hcpi[valid].groupby([sex[valid], tee[valid]]).groups.items():
+        values = hcpi.loc[rows].to_numpy()
+        tee_18 = find_tee(index, category, tee_color, 18, holes_18)
+        tee_9 = find_tee(index, category, tee_color, 9, holes_9)
+        if tee_18: ch18.loc[rows] = course_handicaps_18_many(tee_18, values)
+        if tee_9: ch9.loc[rows] = course_handicaps_9_many(tee_9, values)
+    return ch18, ch9
+
+
+def _receiver(ch1, ch2, name1, name2):
+    """Name des Spielers/Teams mit dem höheren CH (erhält die Schläge); leer bei Gleichstand oder fehlendem CH."""
+    first_gets = (ch1 > ch2).fillna(False).to_numpy(dtype=bool)
+    second_gets = (ch2 > ch1).fillna(False).to_numpy(dtype=bool)
+    return pd.Series(np.where(first_gets, name1, np.where(second_gets, name2, "")), index=ch1.index)
+
+
+def process_singles_chunk(df, index):
+    """FA-02 für einen Block von Einzel-Paarungen: CH18/CH9 beider Spieler und die Vorgabeschläge."""
+    _check_columns(df, SINGLES_COLUMNS)
+    out = df.copy()
+    for n in ("1", "2"):
+        out[f"hcpi_{n}"] = _hcpi_series(df[f"hcpi_{n}"])
+        out[f"ch18_{n}"], out[f"ch9_{n}"] = _player_course_handicaps(index, df[f"geschlecht_{n}"], df[f"abschlag_{n}"], out[f"hcpi_{n}"])
+    for holes in ("18", "9"):
+        ch1, ch2 = out[f"ch{holes}_1"], out[f"ch{holes}_2"]
+        # |CH1 - CH2| * 2/3, half-to-even gerundet wie urs_round
+        out[f"vorgabe_{holes}"] = ((ch1 - ch2).abs() * 2 / 3).round().astype("Int64")
+        out[f"empfaenger_{holes}"] = _receiver(ch1, ch2, out["name_1"], out["name_2"])
+    return out
+
+
+def process_foursome_chunk(df, index, category, tee_color, holes_18, holes_9):
+    """FA-03 für einen Block von Vierer-Paarungen: Team-HCPI (60/40), Team-CH auf dem Standardplatz und Vorgabe."""
+    _check_columns(df, FOURSOME_COLUMNS)
+    tee_18 = find_tee(index, category, tee_color, holes_name=holes_18)
+    tee_9 = find_tee(index, category, tee_color, holes_name=holes_9)
+    if not tee_18 or not tee_9:
+        raise ValueError(f"Standard-Platzdaten für Vierer ({category}, {tee_color}) nicht gefunden.")
+    out = df.copy()
+    for team, (p, q) in (("1", ("a", "b")), ("2", ("c", "d"))):
+        hp, hq = _hcpi_series(df[f"hcpi_{p}"]), _hcpi_series(df[f"hcpi_{q}"])
+        out[f"hcpi_{p}"], out[f"hcpi_{q}"] = hp, hq
+        thcpi = pd.Series(team_hcpis_many(hp, hq), index=df.index)
+        out[f"team_hcpi_{team}"] = thcpi
+        ch18 = pd.Series(pd.NA, index=df.index, dtype="Int64")
+        ch9 = pd.Series(pd.NA, index=df.index, dtype="Int64")
+        valid = thcpi.notna()
+        ch18[valid] = course_handicaps_18_many(tee_18, thcpi[valid].to_numpy())
+        ch9[valid] = course_handicaps_9_many(tee_9, thcpi[valid].to_numpy())
+        out[f"team_ch18_{team}"], out[f"team_ch9_{team}"] = ch18, ch9
+    for holes in ("18", "9"):
+        ch1, ch2 = out[f"team_ch{holes}_1"], out[f"team_ch{holes}_2"]
+        out[f"vorgabe_{holes}"] = (ch1 - ch2).abs().astype("Int64")
+        out[f"empfaenger_{holes}"] = _receiver(ch1, ch2, out["team_1"], out["team_2"])
+    return out
+
+
+def read_draw_chunks(source, filename="", chunksize=DEFAULT_CHUNKSIZE):
+    """Liest eine Auslosung blockweise. CSV wird gestreamt (Trennzeichen , oder ; wird erkannt), Excel am Stück gelesen und geteilt."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if filename.lower().endswith((".xlsx", ".xls")):
+        try:
+            df = _normalize_columns(pd.read_excel(source, dtype=str))
+        except zipfile.BadZipFile as e:  # beschädigte oder umbenannte Datei; die App zeigt ValueError als Fehlermeldung
+            raise ValueError(f"{filename} ist keine gültige Excel-Datei.") from e
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+        return
+    for chunk in pd.read_csv(source, sep=None, engine="python", dtype=str, chunksize=chunksize, skipinitialspace=True):
+        yield _normalize_columns(chunk)
+
+
+def process_draw(source, index, mode="einzel", filename="", chunksize=DEFAULT_CHUNKSIZE, foursome_defaults=None):
+    """Verarbeitet eine komplette Auslosung und liefert die Ergebnisblöcke als Generator.
+
+    mode ist "einzel" (FA-02) oder "vierer" (FA-03); für "vierer" ist foursome_defaults ein
+    Tupel (Kategorie, Abschlag, 18-Loch-Platz, 9-Loch-Platz) für die Team-CH-Berechnung,
+    z.B. club_registry.ClubInfo.foursome des gewählten Clubs.
+    """
+    for chunk in read_draw_chunks(source, filename, chunksize):
+        if mode == "vierer":
+            yield process_foursome_chunk(chunk, index, *foursome_defaults)
+        else:
+            yield process_singles_chunk(chunk, index)
+
+
+def process_draw_to_csv(source, target, index, **kwargs):
+    """Streaming-Variante für Skripte: schreibt die Ergebnisblöcke direkt als CSV nach target."""
+    header = True
+    for result in process_draw(source, index, **kwargs):
+        result.to_csv(target, index=False, header=header, mode="w" if header else "a")
+        header = False
+
+
+# --- Paarungs-Matrix: alle möglichen Paarungen eines Kaders ---
+#
+# Statt N² Einzelberechnungen werden die CH aller Spieler einmal vektorisiert bestimmt und die
+# Vorgaben aller Paarungen per Broadcasting (CH als Spalte minus CH als Zeile) in einem Schritt gerechnet.
+
+ROSTER_COLUMNS = ("name", "geschlecht", "abschlag", "hcpi")
+
+
+def _unique_labels(names):
+    """Namen als Zeilen-/Spaltenbeschriftung; doppelte Namen werden durchnummeriert."""
+    seen, labels = {}, []
+    for name in names.astype(str).str.strip():
+        seen[name] = seen.get(name, 0) + 1
+        labels.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return labels
+
+
+def read_roster(source, filename=""):
+    """Liest einen Kader (eine Zeile pro Spieler: name, geschlecht, abschlag, hcpi) aus CSV/Excel."""
+    roster = pd.concat(read_draw_chunks(source, filename), ignore_index=True)
+    _check_columns(roster, ROSTER_COLUMNS)
+    return roster
+
+
+def roster_course_handicaps(roster, index):
+    """Kader mit HCPI als float sowie CH18/CH9 je Spieler (wie FA-02)."""
+    roster = _normalize_columns(roster.reset_index(drop=True).copy())
+    _check_columns(roster, ROSTER_COLUMNS)
+    roster["name"] = _unique_labels(roster["name"])
+    roster["hcpi"] = _hcpi_series(roster["hcpi"])
+    roster["ch18"], roster["ch9"] = _player_course_handicaps(index, roster["geschlecht"], roster["abschlag"], roster["hcpi"])
+    return roster
+
+
+def _allowance_matrix(ch, labels, factor, blocked=None):
+    """Vorzeichenbehaftete Vorgabe aller Paarungen: positiv = Zeile erhält Schläge von Spalte, negativ = gibt sie.
+
+    blocked markiert Paarungen, die nicht möglich sind (Diagonale immer); dort steht <NA>.
+    """
+    values = ch.to_numpy(dtype=float, na_value=np.nan)
+    diff = values[:, None] - values[None, :]
+    strokes = np.sign(diff) * np.rint(np.abs(diff) * factor)  # np.rint rundet half-to-even wie urs_round
+    np.fill_diagonal(strokes, np.nan)
+    if blocked is not None:
+        strokes[blocked] = np.nan
+    return pd.DataFrame(strokes, index=labels, columns=labels).astype("Int64")
+
+
+def singles_allowance_matrices(roster_ch):
+    """FA-02 für alle Paarungen des Kaders: {"18": N×N, "9": N×N} mit |CH1 - CH2| * 2/3."""
+    return {holes: _allowance_matrix(roster_ch[f"ch{holes}"], list(roster_ch["name"]), 2 / 3) for holes in ("18", "9")}
+
+
+def partnerships(roster_ch, index, category, tee_color, holes_18, holes_9):
+    """FA-03 für alle Zweier-Partnerschaften des Kaders: Team-HCPI (60/40) und Team-CH auf dem Standardplatz."""
+    tee_18 = find_tee(index, category, tee_color, holes_name=holes_18)
+    tee_9 = find_tee(index, category, tee_color, holes_name=holes_9)
+    if not tee_18 or not tee_9:
+        raise ValueError(f"Standard-Platzdaten für Vierer ({category}, {tee_color}) nicht gefunden.")
+    first, second = np.triu_indices(len(roster_ch), k=1)
+    hcpi = roster_ch["hcpi"].to_numpy(dtype=float, na_value=np.nan)
+    thcpi = team_hcpis_many(hcpi[first], hcpi[second])
+    names = roster_ch["name"].to_numpy(dtype=object)
+    out = pd.DataFrame({
+        "partnerschaft": names[first] + " / " + names[second],
+        "spieler_1": names[first], "spieler_2": names[second],
+        "nr_1": first, "nr_2": second,
+        "team_hcpi": thcpi,
+        "team_ch18": pd.Series(pd.NA, index=range(len(first)), dtype="Int64"),
+        "team_ch9": pd.Series(pd.NA, index=range(len(first)), dtype="Int64"),
+    })
+    valid = ~np.isnan(thcpi)
+    out.loc[valid, "team_ch18"] = course_handicaps_18_many(tee_18, thcpi[valid])
+    out.loc[valid, "team_ch9"] = course_handicaps_9_many(tee_9, thcpi[valid])
+    return out
+
+
+def partnership_allowance_matrices(partnerships_df):
+    """Vierer-Vorgabe |Team-CH1 - Team-CH2| für alle Partnerschaften gegeneinander; Partnerschaften mit gemeinsamem Spieler sind <NA>."""
+    a, b = partnerships_df["nr_1"].to_numpy(), partnerships_df["nr_2"].to_numpy()
+    shared = ((a[:, None] == a[None, :]) | (a[:, None] == b[None, :])
+              | (b[:, None] == a[None, :]) | (b[:, None] == b[None, :]))
+    labels = list(partnerships_df["partnerschaft"])
+    return {holes: _allowance_matrix(partnerships_df[f"team_ch{holes}"], labels, 1, shared) for holes in ("18", "9")}